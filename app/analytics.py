@@ -0,0 +1,213 @@
+import json
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+
+def create_tables(conn: sqlite3.Connection):
+    # Running per-user aggregates behind GET /analytics; the model-derived
+    # columns are refreshed by each retrain.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS analytics_summary (
+            user_id TEXT PRIMARY KEY,
+            n_entries INTEGER NOT NULL DEFAULT 0,
+            calories_sum REAL NOT NULL DEFAULT 0,
+            calories_count INTEGER NOT NULL DEFAULT 0,
+            first_weight_day INTEGER,
+            first_weight REAL,
+            last_weight_day INTEGER,
+            last_weight REAL,
+            tdee_trend TEXT,
+            feature_importance TEXT
+        )
+    """
+    )
+
+
+def apply_entry(
+    conn: sqlite3.Connection,
+    user_id: str,
+    day: int,
+    old: Optional[Sequence],
+    new: Sequence,
+):
+    """Fold one entry change into the summary.
+
+    ``old``/``new`` are the stored ``(weight, calories)`` before and after
+    the upsert (``old`` is None for a new day). Weights are never cleared by
+    an upsert, so first/last weight only move outward or are overwritten.
+    """
+    conn.execute(
+        "INSERT OR IGNORE INTO analytics_summary (user_id) VALUES (?)", (user_id,)
+    )
+    n_added = 1 if old is None else 0
+    cal_delta, count_delta = 0.0, 0
+    if old is not None and old[1] is not None:
+        cal_delta -= old[1]
+        count_delta -= 1
+    if new[1] is not None:
+        cal_delta += new[1]
+        count_delta += 1
+    conn.execute(
+        """
+        UPDATE analytics_summary SET
+            n_entries = n_entries + ?,
+            calories_sum = calories_sum + ?,
+            calories_count = calories_count + ?
+        WHERE user_id = ?
+        """,
+        (n_added, cal_delta, count_delta, user_id),
+    )
+    if new[0] is not None:
+        conn.execute(
+            """
+            UPDATE analytics_summary SET
+                first_weight_day = CASE
+                    WHEN first_weight_day IS NULL OR ? <= first_weight_day THEN ?
+                    ELSE first_weight_day END,
+                first_weight = CASE
+                    WHEN first_weight_day IS NULL OR ? <= first_weight_day THEN ?
+                    ELSE first_weight END,
+                last_weight_day = CASE
+                    WHEN last_weight_day IS NULL OR ? >= last_weight_day THEN ?
+                    ELSE last_weight_day END,
+                last_weight = CASE
+                    WHEN last_weight_day IS NULL OR ? >= last_weight_day THEN ?
+                    ELSE last_weight END
+            WHERE user_id = ?
+            """,
+            (day, day, day, new[0], day, day, day, new[0], user_id),
+        )
+
+
+def rebuild_summary(conn: sqlite3.Connection, user_id: str):
+    """Recompute the entry aggregates for one user from the entries table."""
+    n, cal_sum, cal_count = conn.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(calories), 0), COUNT(calories)
+        FROM entries WHERE user_id = ?
+        """,
+        (user_id,),
+    ).fetchone()
+    first = (
+        conn.execute(
+            """
+        SELECT day, weight FROM entries
+        WHERE user_id = ? AND weight IS NOT NULL ORDER BY day LIMIT 1
+        """,
+            (user_id,),
+        ).fetchone()
+        or (None, None)
+    )
+    last = (
+        conn.execute(
+            """
+        SELECT day, weight FROM entries
+        WHERE user_id = ? AND weight IS NOT NULL ORDER BY day DESC LIMIT 1
+        """,
+            (user_id,),
+        ).fetchone()
+        or (None, None)
+    )
+    conn.execute(
+        """
+        INSERT INTO analytics_summary (
+            user_id, n_entries, calories_sum, calories_count,
+            first_weight_day, first_weight, last_weight_day, last_weight
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            n_entries = excluded.n_entries,
+            calories_sum = excluded.calories_sum,
+            calories_count = excluded.calories_count,
+            first_weight_day = excluded.first_weight_day,
+            first_weight = excluded.first_weight,
+            last_weight_day = excluded.last_weight_day,
+            last_weight = excluded.last_weight
+        """,
+        (user_id, n, cal_sum, cal_count, *first, *last),
+    )
+
+
+def backfill_summaries(conn: sqlite3.Connection) -> int:
+    users = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT DISTINCT user_id FROM entries
+            WHERE user_id NOT IN (SELECT user_id FROM analytics_summary)
+            """
+        ).fetchall()
+    ]
+    for user_id in users:
+        rebuild_summary(conn, user_id)
+    return len(users)
+
+
+def store_model_outputs(
+    conn: sqlite3.Connection,
+    user_id: str,
+    tdee_trend: List[float],
+    feature_importance: Dict[str, float],
+):
+    conn.execute(
+        "INSERT OR IGNORE INTO analytics_summary (user_id) VALUES (?)", (user_id,)
+    )
+    conn.execute(
+        """
+        UPDATE analytics_summary SET tdee_trend = ?, feature_importance = ?
+        WHERE user_id = ?
+        """,
+        (json.dumps(tdee_trend), json.dumps(feature_importance), user_id),
+    )
+
+
+def load_summary(conn: sqlite3.Connection, user_id: str) -> Optional[dict]:
+    row = conn.execute(
+        """
+        SELECT n_entries, calories_sum, calories_count, first_weight, last_weight,
+               tdee_trend, feature_importance
+        FROM analytics_summary WHERE user_id = ?
+        """,
+        (user_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    weight_change = None
+    if row[3] is not None and row[4] is not None:
+        weight_change = round(row[4] - row[3], 2)
+    return {
+        "n_entries": row[0],
+        "weight_change": weight_change,
+        "avg_calories": round(row[1] / max(1, row[2]), 2),
+        "tdee_trend": json.loads(row[5]) if row[5] is not None else None,
+        "feature_importance": json.loads(row[6]) if row[6] is not None else None,
+    }
+
+
+def energy_balance_sums(conn: sqlite3.Connection, user_id: str, days: int) -> dict:
+    """Regression sums over the user's last ``days`` days of entries.
+
+    ``x`` is the day offset from the latest entry (0 down to ``1 - days``),
+    so the sums stay small enough to combine without cancellation. Weights
+    and calories are counted independently; days missing one still count
+    for the other.
+    """
+    row = conn.execute(
+        """
+        WITH last AS (
+            SELECT MAX(day) AS day FROM entries WHERE user_id = ?
+        ), recent AS (
+            SELECT e.day - last.day AS x, e.weight AS w, e.calories AS c
+            FROM entries e, last
+            WHERE e.user_id = ? AND e.day > last.day - ?
+        )
+        SELECT COUNT(w), SUM(CASE WHEN w IS NOT NULL THEN x END),
+               SUM(CASE WHEN w IS NOT NULL THEN x * x END), SUM(x * w),
+               SUM(w), SUM(w * w), COUNT(c), SUM(c), SUM(c * c)
+        FROM recent
+        """,
+        (user_id, user_id, days),
+    ).fetchone()
+    keys = ("n_w", "sx", "sxx", "sxw", "sw", "sww", "n_c", "sc", "scc")
+    return {k: v or 0 for k, v in zip(keys, row)}
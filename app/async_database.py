@@ -0,0 +1,79 @@
+"""Async mirror of ``app.database`` for use from ``async def`` endpoints.
+
+Each call runs the synchronous helper on the dedicated DB executor, whose
+threads keep their own pooled SQLite connections, so the event loop never
+blocks on sqlite3.
+"""
+
+from typing import AsyncIterator, List, Optional
+
+from app import database
+from app.executors import run_db
+from app.schemas import Entry, UserProfile
+
+
+async def get_user(user_id: str) -> Optional[UserProfile]:
+    return await run_db(database.get_user, user_id)
+
+
+async def get_user_profile(user_id: str) -> Optional[dict]:
+    return await run_db(database.get_user_profile, user_id)
+
+
+async def upsert_user(profile: UserProfile):
+    return await run_db(database.upsert_user, profile)
+
+
+async def get_entries(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    return await run_db(database.get_entries, user_id, start, end, after, limit)
+
+
+async def iter_entries(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after: Optional[str] = None,
+    batch_size: int = database.HISTORY_BATCH_SIZE,
+) -> AsyncIterator[dict]:
+    """Async counterpart of ``database.iter_entries``; one executor hop per batch."""
+    while True:
+        page = await get_entries(user_id, start, end, after=after, limit=batch_size)
+        for entry in page:
+            yield entry
+        if len(page) < batch_size:
+            return
+        after = page[-1]["date"]
+
+
+async def get_entry(user_id: str, date: str) -> Optional[dict]:
+    return await run_db(database.get_entry, user_id, date)
+
+
+async def upsert_entry(user_id: str, entry: Entry):
+    return await run_db(database.upsert_entry, user_id, entry)
+
+
+async def upsert_entries(user_id: str, entries: List[Entry]) -> int:
+    return await run_db(database.upsert_entries, user_id, entries)
+
+
+async def get_analytics_summary(user_id: str) -> Optional[dict]:
+    return await run_db(database.get_analytics_summary, user_id)
+
+
+async def get_api_key_user(key_hash: str) -> Optional[str]:
+    return await run_db(database.get_api_key_user, key_hash)
+
+
+async def add_api_key(user_id: str, key_hash: str):
+    return await run_db(database.add_api_key, user_id, key_hash)
+
+
+async def delete_api_keys(user_id: str) -> List[str]:
+    return await run_db(database.delete_api_keys, user_id)
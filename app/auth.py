@@ -1,16 +1,135 @@
+import hashlib
+import hmac
 import os
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
 from fastapi import Header, HTTPException, Depends
 
+from app import async_database
+
+# The env key is an admin key: it may act for any X-User-Id
 API_KEY = os.environ.get("API_KEY", "changeme")
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_KEYS = int(os.environ.get("AUTH_CACHE_MAX_KEYS", "10000"))
+API_KEY_PREFIX = "mai_"
+
+
+class Principal:
+    """Who a request is authenticated as: the admin or one user."""
+
+    __slots__ = ("user_id",)
+
+    def __init__(self, user_id: Optional[str]):
+        self.user_id = user_id
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user_id is None
+
+    def can_act_for(self, user_id: str) -> bool:
+        return self.is_admin or hmac.compare_digest(
+            self.user_id.encode(), user_id.encode()
+        )
+
+
+ADMIN = Principal(None)
+
+
+def hash_api_key(api_key: str) -> str:
+    # Keys are random 256-bit tokens, so an unsalted digest is safe to index
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str]:
+    """Return a new ``(api_key, digest)``; only the digest is ever stored."""
+    api_key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    return api_key, hash_api_key(api_key)
+
 
+class KeyCache:
+    """TTL cache of key digest -> owning user (None for unknown keys).
 
-def verify_api_key(x_api_key: str = Header(...)):
-    if x_api_key != API_KEY:
+    Unknown keys are cached too, so a client retrying a bad key does not
+    reach SQLite on every request. Revocations in this process drop their
+    entries immediately; other processes notice within the TTL.
+    """
+
+    def __init__(
+        self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_keys=AUTH_CACHE_MAX_KEYS
+    ):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def get(self, key_hash: str) -> Tuple[bool, Optional[str]]:
+        """Return ``(hit, user_id)``."""
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None or entry[1] < time.monotonic():
+                return False, None
+            return True, entry[0]
+
+    def put(self, key_hash: str, user_id: Optional[str]):
+        with self._lock:
+            if len(self._entries) >= self.max_keys:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] >= now}
+                if len(self._entries) >= self.max_keys:
+                    self._entries.clear()
+            self._entries[key_hash] = (user_id, time.monotonic() + self.ttl)
+
+    def discard(self, key_hash: str):
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+key_cache = KeyCache()
+
+
+async def verify_api_key(x_api_key: str = Header(...)) -> Principal:
+    if hmac.compare_digest(x_api_key.encode(), API_KEY.encode()):
+        return ADMIN
+    key_hash = hash_api_key(x_api_key)
+    hit, user_id = key_cache.get(key_hash)
+    if not hit:
+        user_id = await async_database.get_api_key_user(key_hash)
+        key_cache.put(key_hash, user_id)
+    if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    return x_api_key
+    return Principal(user_id)
+
+
+async def require_admin(principal: Principal = Depends(verify_api_key)) -> Principal:
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Admin API key required")
+    return principal
+
 
+def ensure_can_act_for(principal: Principal, user_id: str):
+    if not principal.can_act_for(user_id):
+        raise HTTPException(status_code=403, detail="API key not valid for this user")
 
-def get_user_id(x_user_id: str = Header(...)):
+
+async def get_user_id(
+    x_user_id: str = Header(...), principal: Principal = Depends(verify_api_key)
+):
     if not x_user_id:
         raise HTTPException(status_code=400, detail="Missing X-User-Id header")
+    ensure_can_act_for(principal, x_user_id)
     return x_user_id
+
+
+async def get_current_user(user_id: str = Depends(get_user_id)) -> dict:
+    """Profile of the authenticated user; unknown users get a 404 up front."""
+    profile = await async_database.get_user_profile(user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return profile
@@ -0,0 +1,198 @@
+"""Retrain every user's model in parallel.
+
+Usage::
+
+    python -m app.batch_train --workers 4 --state data/batch_train.state
+
+Users are streamed from the ``users`` table in chunks and each chunk is
+trained in a worker process. Finished users are appended to the state file,
+so an interrupted run continues where it left off with ``--resume``.
+
+``--population`` instead fits the shared population model over every user's
+rows and refreshes the offsets of users too new for a model of their own.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Set
+
+from app.database import get_conn, init_db
+
+DEFAULT_CHUNK_SIZE = 50
+
+
+def iter_user_ids(chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[str]]:
+    """Yield user ids from the ``users`` table in chunks of ``chunk_size``."""
+    cur = get_conn().execute("SELECT user_id FROM users ORDER BY user_id")
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [row[0] for row in rows]
+
+
+def load_state(path: Optional[str]) -> Set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {json.loads(line)["user_id"] for line in f if line.strip()}
+
+
+def _init_worker():
+    # One BLAS/OpenMP thread per process; parallelism comes from the pool
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+
+def train_chunk(user_ids: List[str]) -> List[dict]:
+    """Train a chunk of users in a worker process; never raises per user."""
+    from app.model import train_and_save
+
+    results = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        try:
+            _, status = train_and_save(user_id)
+            error = None
+        except Exception as exc:
+            status, error = "error", repr(exc)
+        results.append(
+            {
+                "user_id": user_id,
+                "status": status,
+                "error": error,
+                "seconds": round(time.perf_counter() - start, 4),
+            }
+        )
+    return results
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(results: List[dict], elapsed: float, skipped: int) -> dict:
+    times = [r["seconds"] for r in results]
+    by_status = {}
+    for r in results:
+        by_status[r["status"]] = by_status.get(r["status"], 0) + 1
+    return {
+        "users": len(results),
+        "skipped_resumed": skipped,
+        "by_status": by_status,
+        "elapsed_seconds": round(elapsed, 2),
+        "users_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "train_seconds": {
+            "p50": _percentile(times, 50),
+            "p95": _percentile(times, 95),
+            "max": max(times) if times else 0.0,
+            "total": round(sum(times), 2),
+        },
+        "slowest": sorted(results, key=lambda r: r["seconds"], reverse=True)[:5],
+        "errors": [r for r in results if r["error"]][:20],
+    }
+
+
+def run(
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    state_path: Optional[str] = None,
+    resume: bool = False,
+    progress=sys.stderr,
+) -> dict:
+    init_db()
+    done = load_state(state_path) if resume else set()
+    if state_path and not resume and os.path.exists(state_path):
+        os.remove(state_path)
+    state = open(state_path, "a") if state_path else None
+    results: List[dict] = []
+    skipped = 0
+    start = time.perf_counter()
+    # Spawned workers open their own SQLite connections instead of
+    # inheriting this process's pooled ones
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=_init_worker
+        ) as pool:
+            futures = []
+            for chunk in iter_user_ids(chunk_size):
+                todo = [u for u in chunk if u not in done]
+                skipped += len(chunk) - len(todo)
+                if todo:
+                    futures.append(pool.submit(train_chunk, todo))
+            for future in as_completed(futures):
+                for result in future.result():
+                    results.append(result)
+                    if state:
+                        state.write(json.dumps(result) + "\n")
+                        state.flush()
+                    if progress:
+                        print(
+                            f"[{len(results)}] {result['user_id']}: "
+                            f"{result['status']} in {result['seconds'] * 1000:.1f} ms",
+                            file=progress,
+                        )
+    finally:
+        if state:
+            state.close()
+    return summarize(results, time.perf_counter() - start, skipped)
+
+
+def run_population() -> dict:
+    """Fit the population model in this process; returns its summary."""
+    from app.model import train_population
+
+    init_db()
+    start = time.perf_counter()
+    summary = train_population(u for chunk in iter_user_ids() for u in chunk)
+    summary["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain all user models.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--state", help="Progress file used for --resume")
+    parser.add_argument(
+        "--resume", action="store_true", help="Skip users already in --state"
+    )
+    parser.add_argument("--report", help="Write the JSON summary to this path")
+    parser.add_argument("--quiet", action="store_true", help="No per-user progress")
+    parser.add_argument(
+        "--population",
+        action="store_true",
+        help="Fit the shared population model instead of per-user models",
+    )
+    args = parser.parse_args(argv)
+    if args.resume and not args.state:
+        parser.error("--resume requires --state")
+
+    if args.population:
+        summary = run_population()
+    else:
+        summary = run(
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            state_path=args.state,
+            resume=args.resume,
+            progress=None if args.quiet else sys.stderr,
+        )
+    report = json.dumps(summary, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
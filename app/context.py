@@ -0,0 +1,68 @@
+from functools import cached_property
+from typing import Any, Optional
+
+from app.database import (
+    get_feature_rows,
+    get_feature_stats,
+    get_user_profile,
+)
+
+
+class UserContext:
+    """Per-request memo of one user's profile, feature stats, features and model.
+
+    Each attribute is loaded on first access and reused for the rest of the
+    request, so endpoints and the functions in ``app.model`` they call hit
+    SQLite and the model registry at most once per item.
+    """
+
+    def __init__(self, user_id: str, profile: Optional[dict] = None):
+        self.user_id = user_id
+        self._recent = {}
+        if profile is not None:
+            # Already loaded while authenticating the request
+            self.__dict__["profile"] = profile
+
+    @cached_property
+    def profile(self) -> Optional[dict]:
+        return get_user_profile(self.user_id)
+
+    @cached_property
+    def feature_stats(self) -> Optional[dict]:
+        return get_feature_stats(self.user_id)
+
+    @cached_property
+    def features(self):
+        """Full-history ``FeatureSet`` from the feature store, or None."""
+        return self._feature_set(None)
+
+    @cached_property
+    def X(self):
+        return None if self.features is None else self.features.frame()
+
+    def recent_X(self, n: int):
+        """Feature matrix of the latest ``n`` rows, reading only those rows."""
+        if "features" in self.__dict__:
+            return None if self.X is None else self.X.iloc[-n:]
+        if n not in self._recent:
+            fs = self._feature_set(n)
+            self._recent[n] = None if fs is None else fs.frame()
+        return self._recent[n]
+
+    def _feature_set(self, limit: Optional[int]):
+        from app.model import feature_set
+
+        if self.feature_stats is None or self.profile is None:
+            return None
+        rows = get_feature_rows(self.user_id, limit)
+        return feature_set(rows, self.feature_stats, self.profile)
+
+    @cached_property
+    def model(self) -> Any:
+        from app.model import load_model
+
+        return load_model(self.user_id)
+
+    def reload_model(self) -> Any:
+        self.__dict__.pop("model", None)
+        return self.model
@@ -0,0 +1,104 @@
+"""Coordination between worker processes through the shared SQLite database.
+
+``training_leases`` gives one process at a time the right to retrain a
+user; leases expire so a crashed worker cannot block a user for long.
+``model_changes`` is an append-only log of model saves that every process
+polls to drop models other processes have replaced.
+"""
+
+import os
+import socket
+import sqlite3
+import time
+from typing import List, Tuple
+
+# How long the log keeps entries; pollers that fall further behind than
+# this simply clear their whole cache
+MODEL_CHANGES_RETENTION_SECONDS = 3600
+
+
+def worker_id() -> str:
+    """Identity of this process (computed per call so forked workers differ)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def create_tables(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS training_leases (
+            user_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS model_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """
+    )
+
+
+def acquire_lease(
+    conn: sqlite3.Connection, user_id: str, owner: str, ttl: float
+) -> bool:
+    """Take (or renew) the training lease for ``user_id``; False if held elsewhere."""
+    now = time.time()
+    cur = conn.execute(
+        """
+        INSERT INTO training_leases (user_id, owner, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            owner = excluded.owner,
+            expires_at = excluded.expires_at
+        WHERE training_leases.expires_at < ? OR training_leases.owner = excluded.owner
+        """,
+        (user_id, owner, now + ttl, now),
+    )
+    return cur.rowcount == 1
+
+
+def release_lease(conn: sqlite3.Connection, user_id: str, owner: str):
+    conn.execute(
+        "DELETE FROM training_leases WHERE user_id = ? AND owner = ?",
+        (user_id, owner),
+    )
+
+
+def record_model_change(conn: sqlite3.Connection, user_id: str, owner: str):
+    now = time.time()
+    conn.execute(
+        "INSERT INTO model_changes (user_id, owner, created_at) VALUES (?, ?, ?)",
+        (user_id, owner, now),
+    )
+    conn.execute(
+        "DELETE FROM model_changes WHERE created_at < ?",
+        (now - MODEL_CHANGES_RETENTION_SECONDS,),
+    )
+
+
+def load_model_changes(
+    conn: sqlite3.Connection, since: int
+) -> Tuple[int, List[Tuple[str, str]], bool]:
+    """Changes after sequence number ``since``.
+
+    Returns ``(latest seq, [(user_id, owner), ...], gap)``; ``gap`` is True
+    when entries after ``since`` were already pruned from the log.
+    """
+    rows = conn.execute(
+        "SELECT seq, user_id, owner FROM model_changes WHERE seq > ? ORDER BY seq",
+        (since,),
+    ).fetchall()
+    if not rows:
+        return since, [], False
+    gap = rows[0][0] > since + 1
+    return rows[-1][0], [(r[1], r[2]) for r in rows], gap
+
+
+def latest_model_change(conn: sqlite3.Connection) -> int:
+    (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM model_changes").fetchone()
+    return seq
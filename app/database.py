@@ -1,82 +1,376 @@
+import datetime
+import os
 import sqlite3
+import threading
+import time
+import weakref
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List, Optional
 from app.schemas import UserProfile, Entry
+from app import analytics, coordination, features, population
+from app.metrics import gauge, timed
 
-DB_PATH = Path("data/entries.db")
+DB_PATH = Path(os.environ.get("DB_PATH", "data/entries.db"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "16384"))
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHED_STATEMENTS = int(os.environ.get("DB_CACHED_STATEMENTS", "256"))
+HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", "500"))
 
 
-def get_conn():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    return sqlite3.connect(DB_PATH)
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that can be tracked weakly by the pool."""
 
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            age INTEGER NOT NULL,
-            gender TEXT NOT NULL,
-            height_cm REAL,
-            body_fat_pct REAL,
-            current_weight REAL
-        )
+_local = threading.local()
+_connections = weakref.WeakSet()
+_pool_lock = threading.Lock()
+
+
+@timed("db.connect")
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS,
+        factory=_PooledConnection,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    with _pool_lock:
+        _connections.add(conn)
+    return conn
+
+
+def get_conn(path: Optional[Path] = None) -> sqlite3.Connection:
+    """Return this thread's long-lived connection to ``path`` (``DB_PATH``).
+
+    Connections are opened once per thread and database path, so the
+    statement cache and page cache survive across requests. Callers must not
+    close the returned connection; use ``with conn:`` to scope a transaction.
     """
+    path = Path(path or DB_PATH)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+
+def open_connections() -> int:
+    with _pool_lock:
+        return len(_connections)
+
+
+gauge(
+    "metabolicai_db_connections",
+    "Open pooled SQLite connections across all threads.",
+    open_connections,
+)
+
+
+def close_all():
+    """Close the pooled connections this thread can close (e.g. on shutdown).
+
+    sqlite3 connections are bound to their creating thread; connections
+    owned by other live threads stay open and are released when they exit.
+    """
+    with _pool_lock:
+        conns = list(_connections)
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            continue
+        with _pool_lock:
+            _connections.discard(conn)
+    _local.conns = {}
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+# Stored day number -> ISO date, evaluated by SQLite for rows sent to clients
+_ISO_DATE = "date(day * 86400, 'unixepoch')"
+
+
+def to_day(value) -> int:
+    """Day number (days since 1970-01-01) of a ``date`` or ISO date string."""
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value)
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+        is not None
     )
-    cur.execute(
+
+
+def _create_entries(conn: sqlite3.Connection):
+    # Clustered on (user_id, day): a user's history is one contiguous range
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS entries (
             user_id TEXT NOT NULL,
-            date TEXT NOT NULL,
+            day INTEGER NOT NULL,
             weight REAL,
-            calories INTEGER,
-            PRIMARY KEY (user_id, date)
+            calories REAL,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    """
+    )
+    # Covers the first/last weigh-in lookups of the analytics summary
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS entries_weights
+        ON entries (user_id, day, weight) WHERE weight IS NOT NULL
+    """
+    )
+
+
+def _migrate_day_numbers(conn: sqlite3.Connection):
+    """TEXT dates -> integer day numbers; REAL calories; WITHOUT ROWID tables."""
+    day = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+    conn.execute("ALTER TABLE entries RENAME TO entries_old")
+    _create_entries(conn)
+    conn.execute(
+        f"""
+        INSERT INTO entries (user_id, day, weight, calories)
+        SELECT user_id, {day.format("date")}, weight, CAST(calories AS REAL)
+        FROM entries_old
+    """
+    )
+    conn.execute("DROP TABLE entries_old")
+    if _has_table(conn, "features"):
+        conn.execute("ALTER TABLE features RENAME TO features_old")
+        features.create_tables(conn)
+        conn.execute(
+            f"""
+            INSERT INTO features (user_id, day, weight_lag1, calories_lag1,
+                                  weight_ma3, calories_ma3, complete)
+            SELECT user_id, {day.format("date")}, weight_lag1, calories_lag1,
+                   weight_ma3, calories_ma3, complete
+            FROM features_old
+        """
+        )
+        conn.execute("DROP TABLE features_old")
+    if _has_table(conn, "analytics_summary"):
+        conn.execute("ALTER TABLE analytics_summary RENAME TO analytics_summary_old")
+        analytics.create_tables(conn)
+        conn.execute(
+            f"""
+            INSERT INTO analytics_summary
+            SELECT user_id, n_entries, calories_sum, calories_count,
+                   {day.format("first_weight_date")}, first_weight,
+                   {day.format("last_weight_date")}, last_weight,
+                   tdee_trend, feature_importance
+            FROM analytics_summary_old
+        """
         )
+        conn.execute("DROP TABLE analytics_summary_old")
+
+
+# Applied in order to existing databases; ``PRAGMA user_version`` records how
+# many have run. Append new steps here and never edit released ones. New
+# databases are created directly at the latest schema by ``init_db``.
+MIGRATIONS = (_migrate_day_numbers,)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bring the schema up to ``SCHEMA_VERSION``; returns migrations applied.
+
+    Each step runs in its own write transaction together with the version
+    bump, so concurrent workers apply it once and a failed step rolls back.
     """
+    applied = 0
+    while True:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version >= SCHEMA_VERSION:
+                return applied
+            if version == 0 and not _has_table(conn, "entries"):
+                version = SCHEMA_VERSION  # new database
+            else:
+                MIGRATIONS[version](conn)
+                version += 1
+                applied += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+
+
+def init_db():
+    with get_conn() as conn:
+        migrate(conn)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                age INTEGER NOT NULL,
+                gender TEXT NOT NULL,
+                height_cm REAL,
+                body_fat_pct REAL,
+                current_weight REAL
+            )
+        """
+        )
+        _create_entries(conn)
+        # Per-user API keys, stored as SHA-256 digests only
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS api_keys (
+                key_hash TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS api_keys_user ON api_keys (user_id)")
+        # Bumped in the same transaction as every write to a user's data;
+        # serves as the ETag for cached responses
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS data_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """
+        )
+        coordination.create_tables(conn)
+        features.create_tables(conn)
+        features.backfill_features(conn)
+        analytics.create_tables(conn)
+        analytics.backfill_summaries(conn)
+        population.create_tables(conn)
+
+
+def _bump_data_version(conn: sqlite3.Connection, user_id: str):
+    conn.execute(
+        """
+        INSERT INTO data_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+        """,
+        (user_id,),
     )
-    conn.commit()
-    conn.close()
 
 
+@timed("db.get_data_version")
+def get_data_version(user_id: str) -> int:
+    row = (
+        get_conn()
+        .execute("SELECT version FROM data_versions WHERE user_id = ?", (user_id,))
+        .fetchone()
+    )
+    return row[0] if row else 0
+
+
+@timed("db.upsert_user")
 def upsert_user(profile: UserProfile):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO users (user_id, age, gender, height_cm, body_fat_pct, current_weight)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-          age=excluded.age,
-          gender=excluded.gender,
-          height_cm=excluded.height_cm,
-          body_fat_pct=excluded.body_fat_pct,
-          current_weight=excluded.current_weight
-    """,
-        (
-            profile.user_id,
-            profile.age,
-            profile.gender,
-            profile.height_cm,
-            profile.body_fat_pct,
-            profile.current_weight,
-        ),
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO users (user_id, age, gender, height_cm, body_fat_pct, current_weight)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+              age=excluded.age,
+              gender=excluded.gender,
+              height_cm=excluded.height_cm,
+              body_fat_pct=excluded.body_fat_pct,
+              current_weight=excluded.current_weight
+        """,
+            (
+                profile.user_id,
+                profile.age,
+                profile.gender,
+                profile.height_cm,
+                profile.body_fat_pct,
+                profile.current_weight,
+            ),
+        )
+        _bump_data_version(conn, profile.user_id)
+
+
+@timed("db.add_api_key")
+def add_api_key(user_id: str, key_hash: str):
+    with get_conn() as conn:
+        conn.execute(
+            "INSERT INTO api_keys (key_hash, user_id, created_at) VALUES (?, ?, ?)",
+            (key_hash, user_id, time.time()),
+        )
+
+
+@timed("db.get_api_key_user")
+def get_api_key_user(key_hash: str) -> Optional[str]:
+    """Return the user owning the key with this digest, or None."""
+    row = (
+        get_conn()
+        .execute("SELECT user_id FROM api_keys WHERE key_hash = ?", (key_hash,))
+        .fetchone()
     )
-    conn.commit()
-    conn.close()
+    return row[0] if row else None
+
+
+@timed("db.delete_api_keys")
+def delete_api_keys(user_id: str) -> List[str]:
+    """Revoke every key of ``user_id``; returns the revoked digests."""
+    with get_conn() as conn:
+        hashes = [
+            row[0]
+            for row in conn.execute(
+                "SELECT key_hash FROM api_keys WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        ]
+        conn.execute("DELETE FROM api_keys WHERE user_id = ?", (user_id,))
+    return hashes
+
+
+@timed("db.acquire_training_lease")
+def acquire_training_lease(user_id: str, ttl: float) -> bool:
+    with get_conn() as conn:
+        return coordination.acquire_lease(conn, user_id, coordination.worker_id(), ttl)
+
+
+@timed("db.release_training_lease")
+def release_training_lease(user_id: str):
+    with get_conn() as conn:
+        coordination.release_lease(conn, user_id, coordination.worker_id())
 
 
+@timed("db.record_model_change")
+def record_model_change(user_id: str):
+    """Tell other worker processes that ``user_id`` has a new model."""
+    with get_conn() as conn:
+        coordination.record_model_change(conn, user_id, coordination.worker_id())
+
+
+@timed("db.get_model_changes")
+def get_model_changes(since: int):
+    """``(latest seq, [(user_id, owner)], gap)`` for changes after ``since``."""
+    return coordination.load_model_changes(get_conn(), since)
+
+
+def get_latest_model_change() -> int:
+    return coordination.latest_model_change(get_conn())
+
+
+@timed("db.get_user")
 def get_user(user_id: str) -> Optional[UserProfile]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT user_id, age, gender, height_cm, body_fat_pct, current_weight FROM users WHERE user_id = ?",
-        (user_id,),
+    row = (
+        get_conn()
+        .execute(
+            "SELECT user_id, age, gender, height_cm, body_fat_pct, current_weight FROM users WHERE user_id = ?",
+            (user_id,),
+        )
+        .fetchone()
     )
-    row = cur.fetchone()
-    conn.close()
     if row:
         return UserProfile(
             user_id=row[0],
@@ -89,50 +383,171 @@ def get_user(user_id: str) -> Optional[UserProfile]:
     return None
 
 
+@timed("db.upsert_entry")
 def upsert_entry(user_id: str, entry: Entry):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO entries (user_id, date, weight, calories)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(user_id, date) DO UPDATE SET
-            weight=COALESCE(excluded.weight, weight),
-            calories=COALESCE(excluded.calories, calories)
-    """,
-        (user_id, entry.date.isoformat(), entry.weight, entry.calories),
-    )
-    conn.commit()
-    conn.close()
+    day = to_day(entry.date)
+    with get_conn() as conn:
+        # Take the write lock up front so the old row read below is consistent
+        conn.execute("BEGIN IMMEDIATE")
+        old = conn.execute(
+            "SELECT weight, calories FROM entries WHERE user_id = ? AND day = ?",
+            (user_id, day),
+        ).fetchone()
+        conn.execute(
+            """
+            INSERT INTO entries (user_id, day, weight, calories)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET
+                weight=COALESCE(excluded.weight, weight),
+                calories=COALESCE(excluded.calories, calories)
+        """,
+            (user_id, day, entry.weight, entry.calories),
+        )
+        features.refresh_features(conn, user_id, day, day)
+        prev = old or (None, None)
+        new = (
+            entry.weight if entry.weight is not None else prev[0],
+            entry.calories if entry.calories is not None else prev[1],
+        )
+        analytics.apply_entry(conn, user_id, day, old, new)
+        _bump_data_version(conn, user_id)
 
 
-def get_entries(user_id: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT date, weight, calories FROM entries
-        WHERE user_id = ?
-        ORDER BY date
-    """,
-        (user_id,),
-    )
-    result = [
+@timed("db.upsert_entries")
+def upsert_entries(user_id: str, entries: List[Entry]) -> int:
+    """Upsert many entries for one user in a single transaction."""
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO entries (user_id, day, weight, calories)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET
+                weight=COALESCE(excluded.weight, weight),
+                calories=COALESCE(excluded.calories, calories)
+        """,
+            [(user_id, to_day(e.date), e.weight, e.calories) for e in entries],
+        )
+        if entries:
+            days = [to_day(e.date) for e in entries]
+            features.refresh_features(conn, user_id, min(days), max(days))
+            analytics.rebuild_summary(conn, user_id)
+            _bump_data_version(conn, user_id)
+    return len(entries)
+
+
+@timed("db.get_entries")
+def get_entries(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Entries for ``user_id`` in date order, optionally filtered.
+
+    ``start``/``end`` bound the date range (inclusive); ``after`` resumes a
+    keyset page after that date, so each page is a range scan of the
+    ``(user_id, day)`` clustered key however deep into the history it is.
+    """
+    sql = f"SELECT {_ISO_DATE}, weight, calories FROM entries WHERE user_id = ?"
+    params: list = [user_id]
+    if start is not None:
+        sql += " AND day >= ?"
+        params.append(to_day(start))
+    if end is not None:
+        sql += " AND day <= ?"
+        params.append(to_day(end))
+    if after is not None:
+        sql += " AND day > ?"
+        params.append(to_day(after))
+    sql += " ORDER BY day"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    cur = get_conn().execute(sql, params)
+    return [
         {"date": row[0], "weight": row[1], "calories": row[2]} for row in cur.fetchall()
     ]
-    conn.close()
-    return result
 
 
-def get_entries_df(user_id: str):
-    import pandas as pd
+def iter_entries(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after: Optional[str] = None,
+    batch_size: int = HISTORY_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Yield entries in date order, reading ``batch_size`` rows at a time.
+
+    Each batch is a separate keyset query, so no cursor is held open between
+    batches and the generator can be resumed from any thread.
+    """
+    while True:
+        page = get_entries(user_id, start, end, after=after, limit=batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after = page[-1]["date"]
+
+
+@timed("db.get_feature_rows")
+def get_feature_rows(user_id: str, limit: Optional[int] = None) -> List[tuple]:
+    """Stored feature rows for a user, oldest first (the latest ``limit`` only)."""
+    return features.load_feature_rows(get_conn(), user_id, limit)
+
+
+@timed("db.get_feature_stats")
+def get_feature_stats(user_id: str) -> Optional[dict]:
+    return features.load_feature_stats(get_conn(), user_id)
 
-    rows = get_entries(user_id)
-    if not rows:
-        return None
-    return pd.DataFrame(rows)
 
+@timed("db.get_latest_features_many")
+def get_latest_features_many(user_ids: List[str]) -> dict:
+    """Profiles, feature stats and latest feature rows for many users at once."""
+    return features.load_latest_many(get_conn(), user_ids)
 
+
+@timed("db.get_analytics_summary")
+def get_analytics_summary(user_id: str) -> Optional[dict]:
+    return analytics.load_summary(get_conn(), user_id)
+
+
+@timed("db.get_energy_balance_sums")
+def get_energy_balance_sums(user_id: str, days: int) -> dict:
+    return analytics.energy_balance_sums(get_conn(), user_id, days)
+
+
+@timed("db.save_model_outputs")
+def save_model_outputs(user_id: str, tdee_trend: list, feature_importance: dict):
+    """Persist the trend and importances of a freshly trained model."""
+    with get_conn() as conn:
+        analytics.store_model_outputs(conn, user_id, tdee_trend, feature_importance)
+        # The user now has a model of their own; drop any population offset
+        population.delete_residual(conn, user_id)
+        _bump_data_version(conn, user_id)
+
+
+@timed("db.save_population_residual")
+def save_population_residual(
+    user_id: str,
+    residual: float,
+    n_rows: int,
+    tdee_trend: list,
+    feature_importance: dict,
+):
+    """Persist a cold-start user's population offset and model outputs."""
+    with get_conn() as conn:
+        population.store_residual(conn, user_id, residual, n_rows)
+        analytics.store_model_outputs(conn, user_id, tdee_trend, feature_importance)
+        _bump_data_version(conn, user_id)
+
+
+@timed("db.get_population_residual")
+def get_population_residual(user_id: str) -> Optional[float]:
+    return population.load_residual(get_conn(), user_id)
+
+
+@timed("db.get_user_profile")
 def get_user_profile(user_id: str) -> Optional[dict]:
     user = get_user(user_id)
     if user:
@@ -140,19 +555,17 @@ def get_user_profile(user_id: str) -> Optional[dict]:
     return None
 
 
+@timed("db.get_entry")
 def get_entry(user_id: str, date: str) -> Optional[dict]:
     """Return a single entry for a given user and date, or None if missing."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT date, weight, calories FROM entries
-        WHERE user_id = ? AND date = ?
-        """,
-        (user_id, date),
+    row = (
+        get_conn()
+        .execute(
+            "SELECT weight, calories FROM entries WHERE user_id = ? AND day = ?",
+            (user_id, to_day(date)),
+        )
+        .fetchone()
     )
-    row = cur.fetchone()
-    conn.close()
     if row:
-        return {"date": row[0], "weight": row[1], "calories": row[2]}
+        return {"date": date, "weight": row[0], "calories": row[1]}
     return None
@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+DB_EXECUTOR_WORKERS = int(os.environ.get("DB_EXECUTOR_WORKERS", "8"))
+MODEL_EXECUTOR_WORKERS = int(
+    os.environ.get("MODEL_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+# Blocking sqlite3 calls and CPU-bound model work run on separate pools, so
+# a burst of predictions cannot starve simple reads of worker threads.
+# Pools are created on first use and dropped by shutdown(), so an app that
+# is stopped and started again in the same process gets fresh ones.
+_POOL_SIZES = {"db": DB_EXECUTOR_WORKERS, "model": MODEL_EXECUTOR_WORKERS}
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(name: str) -> ThreadPoolExecutor:
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ThreadPoolExecutor(
+                    max_workers=_POOL_SIZES[name], thread_name_prefix=name
+                )
+    return pool
+
+
+def db_executor() -> ThreadPoolExecutor:
+    return _pool("db")
+
+
+def model_executor() -> ThreadPoolExecutor:
+    return _pool("model")
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        db_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+async def run_model(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        model_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+def shutdown():
+    """Stop both pools; the next ``run_db``/``run_model`` starts new ones."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
@@ -0,0 +1,274 @@
+import json
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+# Derived columns persisted per (user_id, day); NULL where build_features
+# would produce NaN before its column-mean fill.
+DERIVED_COLUMNS = ("weight_lag1", "calories_lag1", "weight_ma3", "calories_ma3")
+# Rows after a changed day whose features depend on it (lag1 and 3-day MA)
+LOOKAHEAD = 2
+# Below every stored day number (days since 1970-01-01; 0001-01-01 is -719162)
+MIN_DAY = -(1 << 31)
+
+
+def create_tables(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS features (
+            user_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            weight_lag1 REAL,
+            calories_lag1 REAL,
+            weight_ma3 REAL,
+            calories_ma3 REAL,
+            complete INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+    """
+    )
+    # Running sums/counts give the column means used to fill missing values
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS feature_stats (
+            user_id TEXT PRIMARY KEY,
+            n_rows INTEGER NOT NULL DEFAULT 0,
+            n_complete INTEGER NOT NULL DEFAULT 0,
+            sum_weight_lag1 REAL NOT NULL DEFAULT 0,
+            cnt_weight_lag1 INTEGER NOT NULL DEFAULT 0,
+            sum_calories_lag1 REAL NOT NULL DEFAULT 0,
+            cnt_calories_lag1 INTEGER NOT NULL DEFAULT 0,
+            sum_weight_ma3 REAL NOT NULL DEFAULT 0,
+            cnt_weight_ma3 INTEGER NOT NULL DEFAULT 0,
+            sum_calories_ma3 REAL NOT NULL DEFAULT 0,
+            cnt_calories_ma3 INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+
+
+def _mean(values: Sequence[Optional[float]]) -> Optional[float]:
+    present = [v for v in values if v is not None]
+    return sum(present) / len(present) if present else None
+
+
+def derive(window: Sequence[Tuple]) -> Tuple[Optional[float], ...]:
+    """Features for the last row of ``window`` (up to 3 (day, weight, calories) rows)."""
+    prev = window[-2] if len(window) > 1 else None
+    return (
+        prev[1] if prev else None,
+        prev[2] if prev else None,
+        _mean([r[1] for r in window]),
+        _mean([r[2] for r in window]),
+    )
+
+
+def refresh_features(
+    conn: sqlite3.Connection,
+    user_id: str,
+    since: int = MIN_DAY,
+    until: Optional[int] = None,
+) -> int:
+    """Recompute stored features for entries changed in ``[since, until]``.
+
+    Only the changed rows and the ``LOOKAHEAD`` rows after them are
+    rewritten (``until=None`` means through the latest entry), and the
+    per-user running stats are adjusted by the difference. Must run inside
+    the caller's write transaction. Returns the number of rows rewritten.
+    """
+    window = conn.execute(
+        """
+        SELECT day, weight, calories FROM entries
+        WHERE user_id = ? AND day < ?
+        ORDER BY day DESC LIMIT 2
+        """,
+        (user_id, since),
+    ).fetchall()[::-1]
+    rows = conn.execute(
+        """
+        SELECT day, weight, calories FROM entries
+        WHERE user_id = ? AND day >= ?
+        ORDER BY day
+        """,
+        (user_id, since),
+    )
+    sums = [0.0] * len(DERIVED_COLUMNS)
+    counts = [0] * len(DERIVED_COLUMNS)
+    n_rows = n_complete = 0
+    updates = []
+    past_until = 0
+    for row in rows:
+        if until is not None and row[0] > until:
+            past_until += 1
+            if past_until > LOOKAHEAD:
+                break
+        window = (window + [row])[-3:]
+        new = derive(window)
+        complete = 1 if row[1] and row[2] else 0
+        old = conn.execute(
+            """
+            SELECT weight_lag1, calories_lag1, weight_ma3, calories_ma3, complete
+            FROM features WHERE user_id = ? AND day = ?
+            """,
+            (user_id, row[0]),
+        ).fetchone()
+        if old is None:
+            n_rows += 1
+        else:
+            n_complete -= old[4]
+            for i, v in enumerate(old[:4]):
+                if v is not None:
+                    sums[i] -= v
+                    counts[i] -= 1
+        n_complete += complete
+        for i, v in enumerate(new):
+            if v is not None:
+                sums[i] += v
+                counts[i] += 1
+        updates.append((user_id, row[0], *new, complete))
+    if not updates:
+        return 0
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO features
+            (user_id, day, weight_lag1, calories_lag1, weight_ma3, calories_ma3, complete)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        updates,
+    )
+    conn.execute(
+        """
+        INSERT INTO feature_stats (
+            user_id, n_rows, n_complete,
+            sum_weight_lag1, cnt_weight_lag1, sum_calories_lag1, cnt_calories_lag1,
+            sum_weight_ma3, cnt_weight_ma3, sum_calories_ma3, cnt_calories_ma3
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            n_rows = n_rows + excluded.n_rows,
+            n_complete = n_complete + excluded.n_complete,
+            sum_weight_lag1 = sum_weight_lag1 + excluded.sum_weight_lag1,
+            cnt_weight_lag1 = cnt_weight_lag1 + excluded.cnt_weight_lag1,
+            sum_calories_lag1 = sum_calories_lag1 + excluded.sum_calories_lag1,
+            cnt_calories_lag1 = cnt_calories_lag1 + excluded.cnt_calories_lag1,
+            sum_weight_ma3 = sum_weight_ma3 + excluded.sum_weight_ma3,
+            cnt_weight_ma3 = cnt_weight_ma3 + excluded.cnt_weight_ma3,
+            sum_calories_ma3 = sum_calories_ma3 + excluded.sum_calories_ma3,
+            cnt_calories_ma3 = cnt_calories_ma3 + excluded.cnt_calories_ma3
+        """,
+        (
+            user_id,
+            n_rows,
+            n_complete,
+            sums[0],
+            counts[0],
+            sums[1],
+            counts[1],
+            sums[2],
+            counts[2],
+            sums[3],
+            counts[3],
+        ),
+    )
+    return len(updates)
+
+
+def backfill_features(conn: sqlite3.Connection) -> int:
+    """Build the store for users whose entries predate it; returns users filled."""
+    users = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT DISTINCT user_id FROM entries
+            WHERE user_id NOT IN (SELECT user_id FROM feature_stats)
+            """
+        ).fetchall()
+    ]
+    for user_id in users:
+        conn.execute("DELETE FROM features WHERE user_id = ?", (user_id,))
+        refresh_features(conn, user_id)
+    return len(users)
+
+
+def load_feature_rows(
+    conn: sqlite3.Connection, user_id: str, limit: Optional[int] = None
+) -> List[Tuple]:
+    """Return ``(day, weight, calories, *DERIVED_COLUMNS)`` rows, oldest first.
+
+    With ``limit`` only the most recent rows are read.
+    """
+    sql = """
+        SELECT e.day, e.weight, e.calories,
+               f.weight_lag1, f.calories_lag1, f.weight_ma3, f.calories_ma3
+        FROM entries e
+        JOIN features f ON f.user_id = e.user_id AND f.day = e.day
+        WHERE e.user_id = ?
+        ORDER BY e.day DESC
+    """
+    if limit is None:
+        return conn.execute(sql, (user_id,)).fetchall()[::-1]
+    return conn.execute(sql + " LIMIT ?", (user_id, limit)).fetchall()[::-1]
+
+
+def load_feature_stats(conn: sqlite3.Connection, user_id: str) -> Optional[dict]:
+    """Return row counts and the per-column means of the derived features."""
+    row = conn.execute(
+        """
+        SELECT n_rows, n_complete,
+               sum_weight_lag1, cnt_weight_lag1, sum_calories_lag1, cnt_calories_lag1,
+               sum_weight_ma3, cnt_weight_ma3, sum_calories_ma3, cnt_calories_ma3
+        FROM feature_stats WHERE user_id = ?
+        """,
+        (user_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return _stats_from_row(row)
+
+
+def _stats_from_row(row: Sequence) -> dict:
+    means = {
+        col: (row[2 + 2 * i] / row[3 + 2 * i]) if row[3 + 2 * i] else None
+        for i, col in enumerate(DERIVED_COLUMNS)
+    }
+    return {"n_rows": row[0], "n_complete": row[1], "means": means}
+
+
+def load_latest_many(conn: sqlite3.Connection, user_ids: Sequence[str]) -> dict:
+    """Profile, stats and latest feature row for many users in one query.
+
+    Returns ``{user_id: {"profile", "stats", "row"}}`` for users that have a
+    profile and at least one entry; ``row`` matches ``load_feature_rows``.
+    """
+    cur = conn.execute(
+        """
+        SELECT u.user_id, u.age, u.gender, u.height_cm, u.body_fat_pct, u.current_weight,
+               s.n_rows, s.n_complete,
+               s.sum_weight_lag1, s.cnt_weight_lag1, s.sum_calories_lag1, s.cnt_calories_lag1,
+               s.sum_weight_ma3, s.cnt_weight_ma3, s.sum_calories_ma3, s.cnt_calories_ma3,
+               e.day, e.weight, e.calories,
+               f.weight_lag1, f.calories_lag1, f.weight_ma3, f.calories_ma3
+        FROM users u
+        JOIN feature_stats s ON s.user_id = u.user_id
+        JOIN entries e ON e.user_id = u.user_id AND e.day = (
+            SELECT MAX(day) FROM entries WHERE user_id = u.user_id
+        )
+        JOIN features f ON f.user_id = e.user_id AND f.day = e.day
+        WHERE u.user_id IN (SELECT value FROM json_each(?))
+        """,
+        (json.dumps(list(user_ids)),),
+    )
+    result = {}
+    for row in cur:
+        result[row[0]] = {
+            "profile": {
+                "user_id": row[0],
+                "age": row[1],
+                "gender": row[2],
+                "height_cm": row[3],
+                "body_fat_pct": row[4],
+                "current_weight": row[5],
+            },
+            "stats": _stats_from_row(row[6:16]),
+            "row": tuple(row[16:]),
+        }
+    return result
@@ -0,0 +1,151 @@
+import csv
+import json
+import os
+from typing import AsyncIterator, List, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+from app.schemas import Entry
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", "100000"))
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _decode(line: bytes, lineno: int) -> str:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=400, detail=f"Body is not valid UTF-8 on line {lineno}"
+        )
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (line number, decoded line) from the request body as it streams in."""
+    buffer = b""
+    lineno = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            lineno += 1
+            yield lineno, _decode(line, lineno)
+    if buffer:
+        yield lineno + 1, _decode(buffer, lineno + 1)
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[dict]:
+    try:
+        payload = json.loads(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of entries")
+    for record in payload:
+        yield record
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[dict]:
+    async for lineno, line in _iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid JSON on line {lineno}: {exc}"
+            )
+
+
+async def _iter_csv_records(request: Request) -> AsyncIterator[str]:
+    """Join physical lines into CSV records.
+
+    A quoted field may span lines; a record is complete once its quotes
+    balance (an escaped quote is doubled, so it never changes the parity).
+    """
+    record = None
+    async for _, line in _iter_lines(request):
+        record = line if record is None else f"{record}\n{line}"
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            yield record
+        record = None
+    if record is not None:
+        raise HTTPException(status_code=400, detail="Unterminated quoted CSV field")
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[dict]:
+    header = None
+    async for record in _iter_csv_records(request):
+        row = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip().lower() for h in row]
+            if "date" not in header:
+                raise HTTPException(
+                    status_code=400, detail="CSV header must include a 'date' column"
+                )
+            continue
+        # Blank cells mean "not logged", matching a JSON null
+        yield {k: (v.strip() or None) for k, v in zip(header, row)}
+
+
+def iter_records(request: Request) -> AsyncIterator[dict]:
+    """Pick a record parser from the Content-Type header."""
+    content_type = request.headers.get("content-type", "application/json")
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return _iter_csv(request)
+    if media_type in NDJSON_TYPES:
+        return _iter_ndjson(request)
+    if media_type == "application/json":
+        return _iter_json_array(request)
+    raise HTTPException(
+        status_code=415, detail=f"Unsupported Content-Type '{media_type}'"
+    )
+
+
+def validate_chunk(records: List[dict], offset: int) -> List[Entry]:
+    """Validate a chunk of raw records, reporting errors by absolute row index."""
+    entries, errors = [], []
+    for i, record in enumerate(records):
+        try:
+            entries.append(Entry.model_validate(record))
+        except ValidationError as exc:
+            errors.append(
+                {
+                    "row": offset + i,
+                    "errors": exc.errors(
+                        include_url=False, include_input=False, include_context=False
+                    ),
+                }
+            )
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return entries
+
+
+async def read_entries(request: Request) -> Tuple[List[Entry], int]:
+    """Parse and validate a bulk upload in chunks; returns (entries, chunks)."""
+    entries: List[Entry] = []
+    pending: List[dict] = []
+    chunks = 0
+    async for record in iter_records(request):
+        pending.append(record)
+        if len(entries) + len(pending) > BULK_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Bulk uploads are limited to {BULK_MAX_ROWS} rows",
+            )
+        if len(pending) >= BULK_CHUNK_SIZE:
+            entries.extend(validate_chunk(pending, len(entries)))
+            pending = []
+            chunks += 1
+    if pending:
+        entries.extend(validate_chunk(pending, len(entries)))
+        chunks += 1
+    return entries, chunks
@@ -1,20 +1,68 @@
-from fastapi import FastAPI, Depends, HTTPException, Body
-from app.auth import verify_api_key, get_user_id
+from fastapi import FastAPI, Depends, HTTPException, Body, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from app.auth import (
+    Principal,
+    verify_api_key,
+    require_admin,
+    ensure_can_act_for,
+    get_user_id,
+    get_current_user,
+    generate_api_key,
+    key_cache,
+)
 from app.database import (
     init_db,
+    close_all,
+    get_data_version,
+    get_feature_stats,
+    get_user_profile,
+)
+from app.async_database import (
     upsert_user,
     get_user,
     upsert_entry,
+    upsert_entries,
     get_entry,
     get_entries,
-    get_user_profile,
+    iter_entries,
+    get_analytics_summary,
+    add_api_key,
+    delete_api_keys,
 )
+from app.executors import (
+    model_executor,
+    run_db,
+    run_model,
+    shutdown as shutdown_executors,
+)
+from app.model_store import get_model_store
+from app.response_cache import response_cache, make_etag, etag_matches
 from app.model import (
+    preload,
     predict_tdee,
-    retrain_on_new_entry,
+    predict_tdee_many,
+    energy_balance_tdee,
     get_feature_importance,
     tdee_trend,
+    ANALYTICS_TREND_WINDOW,
+    POPULATION_MODEL_ID,
+    MIN_TRAINING_ROWS,
+    has_model,
+    model_is_stale,
+)
+from app.context import UserContext
+from app.training import (
+    training_scheduler,
+    TRAINING_SHUTDOWN_SECONDS,
+    TRAINING_WAIT_SECONDS,
 )
+from app.registry import model_registry, model_change_watcher
 from app.schemas import (
     Entry,
     EntryUpdate,
@@ -22,16 +70,44 @@ from app.schemas import (
     TDEEPrediction,
     Analytics,
     UserProfileUpdate,  # <-- Added!
+    BulkIngestResult,
+    TDEEBatchRequest,
+    TDEEBatchResponse,
 )
+from app.ingest import read_entries
+from app import metrics
 from typing import List, Optional
 from contextlib import asynccontextmanager
+from datetime import date
+import asyncio
+import json
+import os
+import time
+
+HISTORY_MAX_PAGE_SIZE = 1000
+# Import the ML stack in the background at startup instead of on first use
+ML_PRELOAD = os.environ.get("ML_PRELOAD", "1").lower() not in ("0", "false", "no")
 
 
 # --- FastAPI App with Lifespan Event ---
 @asynccontextmanager
 async def lifespan(app):
     init_db()
+    training_scheduler.start()
+    model_change_watcher.start()
+    if ML_PRELOAD:
+        # Not awaited: startup completes and the server starts accepting
+        # requests while pandas/xgboost/sklearn load in the background
+        asyncio.get_running_loop().run_in_executor(model_executor(), preload)
     yield
+    model_change_watcher.stop()
+    # Off the event loop, and bounded: a user leased by another process
+    # stays queued until that lease expires
+    await asyncio.to_thread(
+        training_scheduler.shutdown, timeout=TRAINING_SHUTDOWN_SECONDS
+    )
+    shutdown_executors()
+    close_all()
 
 
 app = FastAPI(
@@ -42,15 +118,41 @@ app = FastAPI(
 )
 
 
+if metrics.METRICS_ENABLED:
+
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(response.status_code),
+        )
+        return response
+
+
+async def get_user_context(user: dict = Depends(get_current_user)) -> UserContext:
+    """Request-scoped ``UserContext``, seeded with the authenticated profile."""
+    return UserContext(user["user_id"], profile=user)
+
+
 # --- User Profile Endpoints ---
-@app.post("/user", tags=["User"], dependencies=[Depends(verify_api_key)])
-def create_user(profile: UserProfile):
-    upsert_user(profile)
+@app.post("/user", tags=["User"])
+async def create_user(
+    profile: UserProfile, principal: Principal = Depends(verify_api_key)
+):
+    ensure_can_act_for(principal, profile.user_id)
+    if profile.user_id == POPULATION_MODEL_ID:
+        raise HTTPException(status_code=400, detail="Reserved user_id")
+    await upsert_user(profile)
     return {"msg": "Profile created/updated", "profile": profile}
 
 
-@app.patch("/user", tags=["User"], dependencies=[Depends(verify_api_key)])
-def patch_user(
+@app.patch("/user", tags=["User"])
+async def patch_user(
     patch: UserProfileUpdate = Body(
         ...,
         examples={
@@ -59,38 +161,54 @@ def patch_user(
                 "value": {"user_id": "demo", "body_fat_pct": 15.5},
             }
         },
-    )
+    ),
+    principal: Principal = Depends(verify_api_key),
 ):
-    profile = get_user(patch.user_id)
+    ensure_can_act_for(principal, patch.user_id)
+    profile = await get_user(patch.user_id)
     if not profile:
         raise HTTPException(status_code=404, detail="User not found")
     update_data = profile.model_dump()
     for field in ["age", "gender", "height_cm", "body_fat_pct", "current_weight"]:
         if getattr(patch, field, None) is not None:
             update_data[field] = getattr(patch, field)
-    upsert_user(UserProfile(**update_data))
+    await upsert_user(UserProfile(**update_data))
     return {"msg": "Profile patched", "profile": update_data}
 
 
 @app.get("/user", tags=["User"], dependencies=[Depends(verify_api_key)])
-def get_user_endpoint(user_id: str = Depends(get_user_id)):
-    profile = get_user_profile(user_id)
-    if not profile:
-        raise HTTPException(status_code=404, detail="User not found")
-    return profile
+async def get_user_endpoint(user: dict = Depends(get_current_user)):
+    return user
+
+
+@app.post("/user/api-key", tags=["User"], dependencies=[Depends(verify_api_key)])
+async def create_api_key(user: dict = Depends(get_current_user)):
+    """Issue a new API key for the user; it is shown once and stored hashed."""
+    api_key, key_hash = generate_api_key()
+    await add_api_key(user["user_id"], key_hash)
+    key_cache.discard(key_hash)
+    return {"user_id": user["user_id"], "api_key": api_key}
+
+
+@app.delete("/user/api-key", tags=["User"], dependencies=[Depends(verify_api_key)])
+async def revoke_api_keys(user_id: str = Depends(get_user_id)):
+    hashes = await delete_api_keys(user_id)
+    for key_hash in hashes:
+        key_cache.discard(key_hash)
+    return {"msg": "API keys revoked", "revoked": len(hashes)}
 
 
 # --- Entry Management Endpoints ---
 @app.post("/entry", tags=["Entries"], dependencies=[Depends(verify_api_key)])
-def post_entry(entry: Entry, user_id: str = Depends(get_user_id)):
-    upsert_entry(user_id, entry)
-    retrain_on_new_entry(user_id)
+async def post_entry(entry: Entry, user_id: str = Depends(get_user_id)):
+    await upsert_entry(user_id, entry)
+    training_scheduler.mark_dirty(user_id)
     return {"msg": "Entry logged", "entry": entry}
 
 
 @app.patch("/entry", tags=["Entries"], dependencies=[Depends(verify_api_key)])
-def patch_entry(patch: EntryUpdate, user_id: str = Depends(get_user_id)):
-    entry = get_entry(user_id, patch.date.isoformat())
+async def patch_entry(patch: EntryUpdate, user_id: str = Depends(get_user_id)):
+    entry = await get_entry(user_id, patch.date.isoformat())
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found for that date")
     update_data = entry.copy()
@@ -98,37 +216,191 @@ def patch_entry(patch: EntryUpdate, user_id: str = Depends(get_user_id)):
         update_data["weight"] = patch.weight
     if patch.calories is not None:
         update_data["calories"] = patch.calories
-    upsert_entry(user_id, Entry(**update_data))
-    retrain_on_new_entry(user_id)
+    await upsert_entry(user_id, Entry(**update_data))
+    training_scheduler.mark_dirty(user_id)
     return {"msg": "Entry patched", "entry": update_data}
 
 
+@app.post(
+    "/entries/bulk",
+    response_model=BulkIngestResult,
+    tags=["Entries"],
+    dependencies=[Depends(verify_api_key)],
+)
+async def post_entries_bulk(request: Request, user_id: str = Depends(get_user_id)):
+    """Ingest many entries from a JSON array, NDJSON or CSV body.
+
+    Rows are validated in chunks, written in one transaction and followed by
+    a single retrain, regardless of how many days are uploaded.
+    """
+    start = time.perf_counter()
+    entries, chunks = await read_entries(request)
+    rows = await upsert_entries(user_id, entries)
+    if rows:
+        training_scheduler.mark_dirty(user_id)
+    elapsed = time.perf_counter() - start
+    return BulkIngestResult(
+        rows=rows,
+        chunks=chunks,
+        elapsed_ms=round(elapsed * 1000, 2),
+        rows_per_sec=round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+    )
+
+
+def _current_versions(user_id: str, with_model: bool) -> tuple:
+    """(data version, model version or None) that an ETag is built from."""
+    model_version = (get_model_store().version(user_id) or 0) if with_model else None
+    return get_data_version(user_id), model_version
+
+
+async def _cached_response(
+    request: Request, endpoint: str, user_id: str, with_model: bool, compute, *key
+):
+    """Serve ``compute()`` with an ETag, 304s and the server-side cache.
+
+    The ETag is the user's data version, plus the stored model version for
+    model-derived responses, so repeat reads skip ``compute`` entirely.
+    """
+    versions = await run_db(_current_versions, user_id, with_model)
+    etag = make_etag(*versions)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = response_cache.get((endpoint, user_id, etag, *key))
+    if content is None:
+        content = JSONResponse(jsonable_encoder(await compute())).body
+        # A write or retrain that landed during compute() (e.g. the user's
+        # first model, which /tdee waits for) leaves the body matching
+        # neither version: serve it once, untagged and uncached
+        if await run_db(_current_versions, user_id, with_model) != versions:
+            return Response(
+                content,
+                media_type="application/json",
+                headers={"Cache-Control": "no-store"},
+            )
+        response_cache.put((endpoint, user_id, etag, *key), content)
+    return Response(content, media_type="application/json", headers=headers)
+
+
 @app.get("/history", tags=["Entries"], dependencies=[Depends(verify_api_key)])
-def get_history(user_id: str = Depends(get_user_id)):
-    entries = get_entries(user_id)
-    return {"entries": entries}
+async def get_history(
+    request: Request,
+    user_id: str = Depends(get_user_id),
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    after: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """Entries in date order, optionally within ``from``/``to`` (inclusive).
+
+    With ``limit`` the response is one page plus ``next_after``, the cursor
+    to pass as ``after`` for the next page. ``format=ndjson`` streams the
+    whole range one entry per line, reading it from SQLite in batches.
+    """
+    start_s = start.isoformat() if start else None
+    end_s = end.isoformat() if end else None
+    after_s = after.isoformat() if after else None
+    if format == "ndjson":
+
+        async def lines():
+            async for entry in iter_entries(user_id, start_s, end_s, after_s):
+                yield json.dumps(entry) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def page():
+        if limit is None:
+            entries = await get_entries(user_id, start_s, end_s, after_s)
+            return {"entries": entries, "next_after": None}
+        entries = await get_entries(user_id, start_s, end_s, after_s, limit + 1)
+        next_after = entries[limit - 1]["date"] if len(entries) > limit else None
+        return {"entries": entries[:limit], "next_after": next_after}
+
+    return await _cached_response(
+        request, "history", user_id, False, page, start_s, end_s, after_s, limit
+    )
 
 
 # --- TDEE Prediction ---
-@app.get("/tdee", tags=["Prediction"], dependencies=[Depends(verify_api_key)])
-def get_tdee(user_id: str = Depends(get_user_id)):
-    profile = get_user_profile(user_id)
-    entries = get_entries(user_id)
-    if (
-        not profile
-        or not entries
-        or len([e for e in entries if e["weight"] and e["calories"]]) < 3
-    ):
+def _compute_tdee(ctx: UserContext, reload: bool = False) -> Optional[float]:
+    """Score the user's model; None if no model exists yet."""
+    user_id = ctx.user_id
+    stats = ctx.feature_stats
+    if not ctx.profile or not stats or stats["n_complete"] < 3:
         raise HTTPException(
             status_code=400,
             detail="Not enough data. Log at least 3 entries with both weight and calories.",
         )
-    tdee = predict_tdee(user_id)
+    if reload:
+        ctx.reload_model()
+    return predict_tdee(user_id, ctx)
+
+
+async def _predict_tdee(ctx: UserContext) -> float:
+    tdee = await run_model(_compute_tdee, ctx)
+    pending = training_scheduler.when_trained(ctx.user_id) if tdee is None else None
+    if pending is not None:
+        # The first model for this user is still queued: wait for it on the
+        # event loop, so no model-pool thread is parked meanwhile
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(pending), TRAINING_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            tdee = await run_model(_compute_tdee, ctx, True)
     if tdee is None:
         raise HTTPException(
             status_code=400, detail="Model not trained or not enough data."
         )
-    return {"tdee": tdee}
+    return tdee
+
+
+def _compute_energy_balance(user_id: str) -> dict:
+    estimate = energy_balance_tdee(user_id)
+    if estimate is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Not enough data. Log weight and calories on at least 2 days.",
+        )
+    return estimate
+
+
+@app.get("/tdee", tags=["Prediction"], dependencies=[Depends(verify_api_key)])
+async def get_tdee(
+    request: Request,
+    engine: str = Query("ml", pattern="^(ml|energy_balance)$"),
+    ctx: UserContext = Depends(get_user_context),
+):
+    """``engine=ml`` scores the user's model; ``engine=energy_balance`` derives
+    TDEE in closed form from recent entries, with 95% bounds and no model."""
+    if engine == "energy_balance":
+
+        async def compute():
+            # A single aggregate query; no features, model or retrain involved
+            estimate = await run_db(_compute_energy_balance, ctx.user_id)
+            return {"engine": engine, **estimate}
+
+        return await _cached_response(
+            request, "tdee", ctx.user_id, False, compute, engine
+        )
+
+    async def compute():
+        # Feature reads, model loading and scoring all run on the model executor
+        return {"tdee": await _predict_tdee(ctx)}
+
+    return await _cached_response(request, "tdee", ctx.user_id, True, compute, engine)
+
+
+@app.post(
+    "/tdee/batch",
+    response_model=TDEEBatchResponse,
+    tags=["Prediction"],
+    dependencies=[Depends(require_admin)],
+)
+async def get_tdee_batch(request: TDEEBatchRequest):
+    results, errors = await run_model(predict_tdee_many, request.user_ids)
+    return TDEEBatchResponse(results=results, errors=errors)
 
 
 # --- Analytics Endpoints ---
@@ -138,25 +410,27 @@ def get_tdee(user_id: str = Depends(get_user_id)):
     tags=["Analytics"],
     dependencies=[Depends(verify_api_key)],
 )
-def analytics(user_id: str = Depends(get_user_id)):
-    entries = get_entries(user_id)
-    if not entries or len(entries) < 2:
-        raise HTTPException(status_code=400, detail="Not enough entries for analytics.")
-    first = next((e for e in entries if e["weight"] is not None), None)
-    last = next((e for e in reversed(entries) if e["weight"] is not None), None)
-    weight_change = None
-    if first and last and first["weight"] is not None and last["weight"] is not None:
-        weight_change = round(last["weight"] - first["weight"], 2)
-    avg_calories = round(
-        sum(e["calories"] for e in entries if e["calories"] is not None)
-        / max(1, len([e for e in entries if e["calories"] is not None])),
-        2,
+async def analytics(request: Request, ctx: UserContext = Depends(get_user_context)):
+    return await _cached_response(
+        request, "analytics", ctx.user_id, True, lambda: _analytics(ctx)
     )
-    tdee_trend_data = tdee_trend(user_id, window=min(len(entries), 7))
-    feature_imp = get_feature_importance(user_id)
+
+
+async def _analytics(ctx: UserContext) -> Analytics:
+    user_id = ctx.user_id
+    summary = await get_analytics_summary(user_id)
+    if not summary or summary["n_entries"] < 2:
+        raise HTTPException(status_code=400, detail="Not enough entries for analytics.")
+    tdee_trend_data = summary["tdee_trend"]
+    feature_imp = summary["feature_importance"]
+    if tdee_trend_data is None:
+        # Model predates the materialized summary (or none trained yet)
+        window = min(summary["n_entries"], ANALYTICS_TREND_WINDOW)
+        tdee_trend_data = await run_model(tdee_trend, user_id, window=window, ctx=ctx)
+        feature_imp = await run_model(get_feature_importance, user_id, ctx)
     return Analytics(
-        weight_change=weight_change,
-        avg_calories=avg_calories,
+        weight_change=summary["weight_change"],
+        avg_calories=summary["avg_calories"],
         tdee_trend=tdee_trend_data,
         feature_importance=feature_imp,
     )
@@ -167,8 +441,8 @@ def analytics(user_id: str = Depends(get_user_id)):
     tags=["Analytics"],
     dependencies=[Depends(verify_api_key)],
 )
-def feature_importance(user_id: str = Depends(get_user_id)):
-    imp = get_feature_importance(user_id)
+async def feature_importance(ctx: UserContext = Depends(get_user_context)):
+    imp = await run_model(get_feature_importance, ctx.user_id, ctx)
     if imp is None:
         raise HTTPException(
             status_code=400, detail="Not enough data or model not trained yet."
@@ -176,6 +450,58 @@ def feature_importance(user_id: str = Depends(get_user_id)):
     return imp
 
 
+# --- Model Training Status ---
+def _model_status(user_id: str) -> dict:
+    """Scheduler state for pending work, otherwise what the model store holds."""
+    status = training_scheduler.status(user_id)
+    state = status["state"]
+    history = get_model_store().history(user_id)
+    if state == "idle":
+        stats = get_feature_stats(user_id)
+        if has_model(user_id):
+            state = "stale" if model_is_stale(user_id) else "fresh"
+        elif (
+            stats is None
+            or stats["n_rows"] < MIN_TRAINING_ROWS
+            or get_user_profile(user_id) is None
+        ):
+            state = "not_enough_data"
+        else:
+            state = "untrained"
+    return {
+        "user_id": user_id,
+        "state": state,
+        "data_version": get_data_version(user_id),
+        "model_version": history[0]["version"] if history else None,
+        "trained_at": history[0]["created_at"] if history else None,
+        "last_error": status["last_error"],
+    }
+
+
+@app.get("/model/status", tags=["Prediction"], dependencies=[Depends(verify_api_key)])
+async def model_status(user_id: str = Depends(get_user_id)):
+    return await run_db(_model_status, user_id)
+
+
+@app.get("/model/training", tags=["Prediction"], dependencies=[Depends(require_admin)])
+async def model_training_stats():
+    return training_scheduler.stats()
+
+
+@app.get("/model/cache", tags=["Prediction"], dependencies=[Depends(require_admin)])
+async def model_cache_stats():
+    return model_registry.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/")
-def root():
+async def root():
     return {"msg": "Welcome to MetabolicAI!"}
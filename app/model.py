@@ -1,19 +1,90 @@
+import hashlib
+import math
 import os
+import io
+import json
+import logging
+import time
 import numpy as np
-import pandas as pd
-import joblib
-from xgboost import XGBRegressor
-from sklearn.linear_model import LinearRegression
-from app.database import get_entries_df, get_user_profile
-from typing import Optional, Dict, Any
+from app.context import UserContext
+from app.features import DERIVED_COLUMNS
+from app.database import (
+    acquire_training_lease,
+    get_data_version,
+    get_energy_balance_sums,
+    get_latest_features_many,
+    get_population_residual,
+    record_model_change,
+    release_training_lease,
+    save_model_outputs,
+    save_population_residual,
+)
+from app.registry import model_registry
+from app import metrics
+from app import serialization
+from app.model_store import get_model_store
+from typing import TYPE_CHECKING, Optional, Dict, Any, Iterable, List, Tuple
 
+# pandas, xgboost, sklearn and joblib are imported where they are first
+# needed, so importing this module (and app.main) stays cheap; see preload()
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
 
-def get_model_path(user_id: str):
-    os.makedirs("models", exist_ok=True)
-    return os.path.join("models", f"{user_id}_model.pkl")
+logger = logging.getLogger(__name__)
 
+FEATURE_COLUMNS = [
+    "weight",
+    "calories",
+    "weight_lag1",
+    "calories_lag1",
+    "weight_ma3",
+    "calories_ma3",
+    "age",
+    "gender",
+    "height_cm",
+    "body_fat_pct",
+    "current_weight",
+]
+PROFILE_COLUMNS = FEATURE_COLUMNS[6:]
+ANALYTICS_TREND_WINDOW = 7
+XGB_PARAMS = {"n_estimators": 25, "max_depth": 3, "random_state": 42}
+# "incremental" continues from the stored model when only new days were
+# appended; "full" always refits from scratch
+TRAINING_MODE = os.environ.get("TRAINING_MODE", "full")
+XGB_INCREMENTAL_ROUNDS = int(os.environ.get("XGB_INCREMENTAL_ROUNDS", "5"))
+# A warm start boosts on the trailing window (old rows included, so the new
+# trees do not just fit the new days) at a reduced learning rate, and only
+# once enough new days have accumulated; otherwise the model is refit
+XGB_INCREMENTAL_MIN_ROWS = int(os.environ.get("XGB_INCREMENTAL_MIN_ROWS", "7"))
+XGB_INCREMENTAL_WINDOW = int(os.environ.get("XGB_INCREMENTAL_WINDOW", "90"))
+XGB_INCREMENTAL_LEARNING_RATE = float(
+    os.environ.get("XGB_INCREMENTAL_LEARNING_RATE", "0.1")
+)
+FULL_REFIT_EVERY = int(os.environ.get("FULL_REFIT_EVERY", "10"))
+# Upper bound on one training; a crashed worker's lease expires after this
+TRAINING_LEASE_SECONDS = float(os.environ.get("TRAINING_LEASE_SECONDS", "300"))
+# train_and_save status when another worker process holds the user's lease
+LEASE_BUSY = "busy"
+# Rows a user needs before train_and_save fits a model of their own
+MIN_TRAINING_ROWS = 6
+# Model-store key of the shared model trained over every user's rows
+POPULATION_MODEL_ID = "__population__"
+# Users with fewer rows are served by the population model plus an offset
+# instead of a model of their own (once a population model exists)
+POPULATION_MAX_ROWS = int(os.environ.get("POPULATION_MAX_ROWS", "8"))
+# Pseudo-rows shrinking a user's offset towards 0, so one noisy day does not
+# swing their predictions
+POPULATION_SHRINKAGE_ROWS = float(os.environ.get("POPULATION_SHRINKAGE_ROWS", "3"))
+# Energy-balance engine: energy stored in one kg of body-weight change and
+# the trailing window the estimate is computed over
+KCAL_PER_KG = 7700.0
+ENERGY_BALANCE_WINDOW_DAYS = int(os.environ.get("ENERGY_BALANCE_WINDOW_DAYS", "28"))
+ENERGY_BALANCE_Z = 1.96  # two-sided 95% bounds
+POPULATION_XGB_PARAMS = {"n_estimators": 100, "max_depth": 4, "random_state": 42}
 
-def build_features(df: pd.DataFrame, user_profile: dict) -> pd.DataFrame:
+
+def build_features(df: "pd.DataFrame", user_profile: dict) -> "pd.DataFrame":
     df = df.sort_values("date").copy()
     df["weight_lag1"] = df["weight"].shift(1)
     df["calories_lag1"] = df["calories"].shift(1)
@@ -21,97 +92,610 @@ def build_features(df: pd.DataFrame, user_profile: dict) -> pd.DataFrame:
     df["calories_ma3"] = df["calories"].rolling(window=3, min_periods=1).mean()
     for col in ["weight_lag1", "calories_lag1", "weight_ma3", "calories_ma3"]:
         df[col] = df[col].fillna(df[col].mean())
+    return _add_profile_columns(df, user_profile)
+
+
+def _profile_values(user_profile: dict) -> list:
+    return [
+        user_profile.get("age", 30),
+        1 if user_profile.get("gender") == "male" else 0,
+        user_profile.get("height_cm", 170),
+        user_profile.get("body_fat_pct", np.nan),
+        user_profile.get("current_weight", np.nan),
+    ]
+
+
+def _add_profile_columns(df: "pd.DataFrame", user_profile: dict) -> "pd.DataFrame":
     if user_profile:
-        df["age"] = user_profile.get("age", 30)
-        df["gender"] = 1 if user_profile.get("gender") == "male" else 0
-        df["height_cm"] = user_profile.get("height_cm", 170)
-        df["body_fat_pct"] = user_profile.get("body_fat_pct", np.nan)
-        df["current_weight"] = user_profile.get("current_weight", np.nan)
+        for col, value in zip(PROFILE_COLUMNS, _profile_values(user_profile)):
+            df[col] = value
     return df
 
 
-def train_and_save(user_id: str):
-    df = get_entries_df(user_id)
-    profile = get_user_profile(user_id)
-    if df is None or df.shape[0] < 6 or not profile:
+class FeatureSet:
+    """Columnar model inputs for one user, oldest row first.
+
+    ``days`` are the stored day numbers (days since 1970-01-01); ``X`` is
+    the float32 ``FEATURE_COLUMNS`` matrix with missing values filled;
+    ``raw`` keeps the stored weight and calories (NaN where missing) for the
+    training target and history hash.
+    """
+
+    __slots__ = ("days", "X", "raw")
+
+    def __init__(self, days: Tuple[int, ...], X: np.ndarray, raw: np.ndarray):
+        self.days = days
+        self.X = X
+        self.raw = raw
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.raw[:, 1]  # Target is calories for TDEE estimation
+
+    def frame(self) -> "pd.DataFrame":
+        """``X`` with column names for the models; wraps without copying."""
+        import pandas as pd
+
+        return pd.DataFrame(self.X, columns=FEATURE_COLUMNS, copy=False)
+
+
+def _fill_matrix(values: np.ndarray, means, profiles) -> np.ndarray:
+    """Preallocated float32 ``FEATURE_COLUMNS`` matrix from stored values.
+
+    ``values`` holds weight, calories and the derived columns with NaN for
+    missing cells; missing derived cells take ``means`` and the profile
+    columns take ``profiles`` (both broadcast per row). Anything still
+    missing becomes 0, as in ``feature_matrix``.
+    """
+    X = np.empty((len(values), len(FEATURE_COLUMNS)), dtype=np.float32)
+    X[:, :6] = values
+    derived = X[:, 2:6]
+    np.copyto(derived, means, where=np.isnan(derived))
+    X[:, 6:] = profiles
+    return np.nan_to_num(X, copy=False)
+
+
+def _means_array(stats: dict) -> np.ndarray:
+    return np.array([stats["means"][col] for col in DERIVED_COLUMNS], dtype=np.float32)
+
+
+@metrics.timed("features.build")
+def feature_set(rows, stats: dict, user_profile: dict) -> Optional[FeatureSet]:
+    """Equivalent of ``build_features`` + ``feature_matrix`` from feature-store rows.
+
+    ``rows`` come from ``get_feature_rows`` (possibly only the latest few) and
+    ``stats`` carries the full-history column means used for missing values,
+    so the result matches the corresponding tail of ``build_features``.
+    """
+    if not rows:
+        return None
+    days, *columns = zip(*rows)
+    values = np.array(columns, dtype=np.float32).T
+    X = _fill_matrix(
+        values,
+        _means_array(stats),
+        np.array(_profile_values(user_profile), dtype=np.float32),
+    )
+    return FeatureSet(days, X, values[:, :2].copy())
+
+
+def feature_matrix(df: "pd.DataFrame") -> "pd.DataFrame":
+    return df[FEATURE_COLUMNS].fillna(0)
+
+
+@metrics.timed("model.train")
+def train_and_save(user_id: str, ctx: Optional[UserContext] = None):
+    """Retrain ``user_id`` under a cross-process lease; returns ``(model, status)``.
+
+    Returns ``(None, LEASE_BUSY)`` without training when another worker
+    process is already training this user.
+    """
+    if not acquire_training_lease(user_id, TRAINING_LEASE_SECONDS):
+        return None, LEASE_BUSY
+    try:
+        return _train_and_save(user_id, ctx or UserContext(user_id))
+    finally:
+        release_training_lease(user_id)
+
+
+def _train_and_save(user_id: str, ctx: UserContext):
+    # Read before the training data, so writes racing this fit count as newer
+    data_version = get_data_version(user_id)
+    stats = ctx.feature_stats
+    if stats is None or not ctx.profile:
+        return None, "not_enough_data"
+    if stats["n_rows"] < POPULATION_MAX_ROWS:
+        population = _load_stored(POPULATION_MODEL_ID)
+        if population is not None:
+            return _fit_residual(user_id, ctx, population)
+    if stats["n_rows"] < MIN_TRAINING_ROWS:
+        return None, "not_enough_data"
+    fs = ctx.features
+    X, y = ctx.X, fs.y
+
+    # COALESCE upserts and repeated PATCHes often leave the data as it was
+    fingerprint = training_fingerprint(X, y, ctx.profile)
+    header = load_model_header(user_id)
+    if header is not None and header.get("fingerprint") == fingerprint:
+        return ctx.model, "unchanged"
+
+    history_hash = _history_hash(fs.days, fs.raw, ctx.profile)
+    model, meta, status = None, None, "ok"
+    if TRAINING_MODE == "incremental" and header is not None:
+        model, meta = _fit_incremental(ctx.model, header, fs, X, y, ctx.profile)
+        status = "incremental"
+    if model is None:
+        model, meta = _fit_full(X, y)
+        status = "ok"
+    data = serialization.dumps(
+        model,
+        {
+            "features": FEATURE_COLUMNS,
+            "n_rows": len(fs),
+            "data_hash": serialization.data_hash(X, y),
+            "fingerprint": fingerprint,
+            "history_hash": history_hash,
+            "data_version": data_version,
+            **meta,
+        },
+    )
+    token = get_model_store().save(user_id, data)
+    record_model_change(user_id)
+    # Install the fresh model so readers skip the reload
+    model_registry.put(user_id, model, nbytes=len(data), token=token)
+    # Materialize the model-derived analytics so GET /analytics is a lookup
+    ctx.model = model
+    save_model_outputs(
+        user_id,
+        tdee_trend(user_id, window=min(len(fs), ANALYTICS_TREND_WINDOW), ctx=ctx),
+        get_feature_importance(user_id, ctx),
+    )
+    return model, status
+
+
+class ResidualModel:
+    """Population model plus one user's offset, in place of a per-user model."""
+
+    __slots__ = ("population", "residual")
+
+    def __init__(self, population, residual: float):
+        self.population = population
+        self.residual = residual
+
+    def predict(self, X) -> np.ndarray:
+        return self.population.predict(X) + self.residual
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        return self.population.feature_importances_
+
+
+def _shrunk_residual(errors: np.ndarray) -> float:
+    return float(errors.sum() / (len(errors) + POPULATION_SHRINKAGE_ROWS))
+
+
+def _fit_residual(user_id: str, ctx: UserContext, population):
+    """Serve a cold-start user from ``population`` plus their mean error."""
+    fs = ctx.features
+    known = ~np.isnan(fs.y)
+    if not known.any():
         return None, "not_enough_data"
-    df = build_features(df, profile)
-    X = df[
-        [
-            "weight",
-            "calories",
-            "weight_lag1",
-            "calories_lag1",
-            "weight_ma3",
-            "calories_ma3",
-            "age",
-            "gender",
-            "height_cm",
-            "body_fat_pct",
-            "current_weight",
-        ]
-    ].fillna(0)
-    y = df["calories"]  # Target is calories for TDEE estimation
+    errors = fs.y[known] - population.predict(ctx.X[known])
+    return _install_residual(user_id, ctx, population, errors), "population"
+
+
+def _install_residual(
+    user_id: str, ctx: UserContext, population, errors: np.ndarray
+) -> ResidualModel:
+    model = ResidualModel(population, _shrunk_residual(errors))
+    # A model left from an earlier fit would shadow the offset
+    if get_model_store().delete(user_id):
+        model_registry.invalidate(user_id)
+        record_model_change(user_id)
+    ctx.model = model
+    n = len(ctx.features)
+    save_population_residual(
+        user_id,
+        model.residual,
+        n,
+        tdee_trend(user_id, window=min(n, ANALYTICS_TREND_WINDOW), ctx=ctx),
+        get_feature_importance(user_id, ctx),
+    )
+    return model
+
+
+@metrics.timed("model.train_population")
+def train_population(user_ids: Iterable[str]) -> dict:
+    """Fit the shared model on every user's rows and refresh cold-start offsets.
+
+    The population model sees the profile columns, so it generalizes across
+    users; users with fewer than ``POPULATION_MAX_ROWS`` rows are then served
+    by it plus a shrunk per-user residual rather than a model of their own.
+    """
+    from xgboost import XGBRegressor
+
+    users, blocks = [], []
+    for user_id in user_ids:
+        ctx = UserContext(user_id)
+        fs = ctx.features
+        if fs is None:
+            continue
+        known = ~np.isnan(fs.y)
+        if known.any():
+            users.append((user_id, ctx, int(known.sum())))
+            blocks.append((fs.X[known], fs.y[known]))
+    n_rows = sum(n for _, _, n in users)
+    if n_rows < POPULATION_MAX_ROWS:
+        return {"status": "not_enough_data", "users": len(users), "rows": n_rows}
+
+    import pandas as pd
+
+    X = pd.DataFrame(
+        np.concatenate([b[0] for b in blocks]), columns=FEATURE_COLUMNS, copy=False
+    )
+    y = np.concatenate([b[1] for b in blocks])
+    model = XGBRegressor(**POPULATION_XGB_PARAMS)
+    model.fit(X, y)
+    data = serialization.dumps(
+        model,
+        {
+            "features": FEATURE_COLUMNS,
+            "n_rows": n_rows,
+            "n_users": len(users),
+            "data_hash": serialization.data_hash(X, y),
+            "increments": 0,
+            "full_fit_rows": n_rows,
+        },
+    )
+    token = get_model_store().save(POPULATION_MODEL_ID, data)
+    record_model_change(POPULATION_MODEL_ID)
+    model_registry.put(POPULATION_MODEL_ID, model, nbytes=len(data), token=token)
+
+    # One prediction pass over all rows gives every user's errors
+    errors = y - model.predict(X)
+    offsets = np.cumsum([0] + [n for _, _, n in users])
+    cold = 0
+    for (user_id, ctx, _), start, end in zip(users, offsets[:-1], offsets[1:]):
+        if len(ctx.features) < POPULATION_MAX_ROWS:
+            _install_residual(user_id, ctx, model, errors[start:end])
+            cold += 1
+    return {
+        "status": "ok",
+        "users": len(users),
+        "rows": n_rows,
+        "cold_start_users": cold,
+        "bytes": len(data),
+    }
 
+
+def _wants_xgboost(n_rows: int) -> bool:
     # XGBoost if enough data, else fallback
-    if len(df) >= 8:
-        model = XGBRegressor(n_estimators=25, max_depth=3, random_state=42)
+    return n_rows >= 8
+
+
+def _linear_stats(X, y) -> Tuple[np.ndarray, np.ndarray]:
+    """Sufficient statistics ``(A'A, A'y)`` of ``A = [X, 1]`` for least squares."""
+    A = np.column_stack([np.asarray(X, dtype=np.float64), np.ones(len(X))])
+    y = np.asarray(y, dtype=np.float64)
+    return A.T @ A, A.T @ y
+
+
+def _linear_from_stats(xtx: np.ndarray, xty: np.ndarray) -> "LinearRegression":
+    from sklearn.linear_model import LinearRegression
+
+    params = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = params[:-1]
+    model.intercept_ = float(params[-1])
+    model.n_features_in_ = len(model.coef_)
+    model.feature_names_in_ = np.asarray(FEATURE_COLUMNS, dtype=object)
+    return model
+
+
+@metrics.timed("model.fit_full")
+def _fit_full(X, y) -> Tuple[Any, dict]:
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    meta = {"increments": 0, "full_fit_rows": int(len(X))}
+    if _wants_xgboost(len(X)):
+        model = XGBRegressor(**XGB_PARAMS)
+        model.fit(X, y)
     else:
         model = LinearRegression()
-    model.fit(X, y)
-    joblib.dump(model, get_model_path(user_id))
-    return model, "ok"
+        model.fit(X, y)
+        xtx, xty = _linear_stats(X, y)
+        meta.update(xtx=xtx.tolist(), xty=xty.tolist())
+    return model, meta
+
+
+@metrics.timed("model.fit_incremental")
+def _fit_incremental(prev_model, header: dict, fs, X, y, user_profile: dict):
+    """Update ``prev_model`` with rows appended since it was trained.
+
+    Returns ``(None, None)`` when a full refit is required instead: the
+    stored rows or profile changed, the model kind changes, too many
+    increments have accumulated, the history doubled since the last full
+    fit, or (XGBoost) fewer than ``XGB_INCREMENTAL_MIN_ROWS`` days are new.
+    XGBoost continues boosting from the stored booster on the trailing
+    ``XGB_INCREMENTAL_WINDOW`` rows; the linear path updates stored
+    sufficient statistics and re-solves, which is exact.
+    """
+    n_old, n = header.get("n_rows", 0), len(fs)
+    kind = (
+        serialization.KIND_XGBOOST if _wants_xgboost(n) else serialization.KIND_LINEAR
+    )
+    if (
+        prev_model is None
+        or n <= n_old
+        or header.get("kind") != kind
+        or header.get("increments", 0) >= FULL_REFIT_EVERY
+        or n > 2 * header.get("full_fit_rows", n)
+        or (kind == serialization.KIND_XGBOOST and n - n_old < XGB_INCREMENTAL_MIN_ROWS)
+        or _history_hash(fs.days[:n_old], fs.raw[:n_old], user_profile)
+        != header.get("history_hash")
+    ):
+        return None, None
+    meta = {
+        "increments": header.get("increments", 0) + 1,
+        "full_fit_rows": header["full_fit_rows"],
+    }
+    if kind == serialization.KIND_XGBOOST:
+        import xgboost
+        from xgboost import XGBRegressor
+
+        start = max(0, min(n_old, n - XGB_INCREMENTAL_WINDOW))
+        # xgboost.train on a plain DMatrix skips the sklearn wrapper's
+        # QuantileDMatrix setup, which dominates for a handful of rows
+        booster = xgboost.train(
+            {
+                "max_depth": XGB_PARAMS["max_depth"],
+                "seed": XGB_PARAMS["random_state"],
+                "learning_rate": XGB_INCREMENTAL_LEARNING_RATE,
+            },
+            xgboost.DMatrix(X.iloc[start:], label=y[start:]),
+            num_boost_round=XGB_INCREMENTAL_ROUNDS,
+            xgb_model=prev_model.get_booster(),
+        )
+        model = XGBRegressor()
+        model._Booster = booster
+    else:
+        xtx, xty = _linear_stats(X.iloc[n_old:], y[n_old:])
+        xtx = xtx + np.asarray(header["xtx"])
+        xty = xty + np.asarray(header["xty"])
+        model = _linear_from_stats(xtx, xty)
+        meta.update(xtx=xtx.tolist(), xty=xty.tolist())
+    return model, meta
+
+
+def _history_hash(days, raw: np.ndarray, user_profile: dict) -> str:
+    """Hash of the raw entries and profile; detects edits to already-seen days."""
+    h = hashlib.sha256()
+    h.update(np.asarray(days, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(raw, dtype=np.float32).tobytes())
+    h.update(json.dumps(user_profile, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def training_fingerprint(X, y, user_profile: dict) -> str:
+    """Hash of everything a fit depends on: features, target, profile, params."""
+    h = hashlib.sha256()
+    h.update(serialization.data_hash(X, y).encode())
+    h.update(json.dumps(user_profile, sort_keys=True, default=str).encode())
+    h.update(json.dumps(XGB_PARAMS, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def load_model_header(user_id: str) -> Optional[dict]:
+    """Metadata header of the user's stored model, or None (also for pickles)."""
+    loaded = get_model_store().load(user_id)
+    if loaded is None or loaded[0][:4] != serialization.MAGIC:
+        return None
+    return serialization.read_header(loaded[0])[0]
+
+
+@metrics.timed("model.deserialize")
+def _deserialize(data: bytes):
+    if data[:4] == serialization.MAGIC:
+        return serialization.loads(data)[0]
+    # Models pickled before the compact format stay readable until retrained
+    import joblib
+
+    return joblib.load(io.BytesIO(data))
+
+
+def has_model(user_id: str) -> bool:
+    """Whether ``user_id`` is served by a stored model or a population offset."""
+    if get_model_store().version(user_id) is not None:
+        return True
+    return get_population_residual(user_id) is not None
+
+
+def model_is_stale(user_id: str) -> bool:
+    """Whether the user's data changed since their stored model was trained.
+
+    Catches retrains that were queued but lost, e.g. to a crash or a
+    bounded shutdown. Saving a model's outputs bumps the data version once,
+    so anything beyond that is re-checked against the training fingerprint:
+    writes that left the training data as it was do not count.
+    """
+    header = load_model_header(user_id)
+    if header is None or "data_version" not in header:
+        return False
+    if get_data_version(user_id) <= header["data_version"] + 1:
+        return False
+    ctx = UserContext(user_id)
+    if ctx.X is None or not ctx.profile:
+        return False
+    return training_fingerprint(ctx.X, ctx.features.y, ctx.profile) != header.get(
+        "fingerprint"
+    )
 
 
 def load_model(user_id: str):
-    path = get_model_path(user_id)
-    if os.path.exists(path):
-        return joblib.load(path)
-    return None
+    """The user's own model, else the population model plus their offset."""
+    model = _load_stored(user_id)
+    if model is not None:
+        return model
+    residual = get_population_residual(user_id)
+    if residual is None:
+        return None
+    population = _load_stored(POPULATION_MODEL_ID)
+    return None if population is None else ResidualModel(population, residual)
 
 
-def predict_tdee(user_id: str) -> Optional[float]:
-    model = load_model(user_id)
-    df = get_entries_df(user_id)
-    profile = get_user_profile(user_id)
-    if model is None or df is None or profile is None or df.empty:
+def _load_stored(user_id: str):
+    store = get_model_store()
+    token = store.version(user_id)
+    if token is None:
         return None
-    df = build_features(df, profile)
-    X = df[
-        [
-            "weight",
-            "calories",
-            "weight_lag1",
-            "calories_lag1",
-            "weight_ma3",
-            "calories_ma3",
-            "age",
-            "gender",
-            "height_cm",
-            "body_fat_pct",
-            "current_weight",
-        ]
-    ].fillna(0)
-    latest = X.iloc[[-1]]
-    pred = float(model.predict(latest)[0])
+    model = model_registry.get(user_id, token=token)
+    if model is None:
+        with metrics.stage("model_store.load"):
+            loaded = store.load(user_id)
+        if loaded is None:
+            return None
+        data, token = loaded
+        model = _deserialize(data)
+        model_registry.put(user_id, model, nbytes=len(data), token=token)
+        metrics.MODEL_LOADS.inc("store")
+    else:
+        metrics.MODEL_LOADS.inc("registry")
+    return model
+
+
+def predict_tdee(user_id: str, ctx: Optional[UserContext] = None) -> Optional[float]:
+    ctx = ctx or UserContext(user_id)
+    model = ctx.model
+    latest = ctx.recent_X(1) if model is not None else None
+    if latest is None:
+        return None
+    with metrics.stage("model.predict"):
+        pred = float(model.predict(latest)[0])
     return round(pred, 2)
 
 
-def get_feature_importance(user_id: str) -> Dict[str, float]:
-    model = load_model(user_id)
-    feature_names = [
-        "weight",
-        "calories",
-        "weight_lag1",
-        "calories_lag1",
-        "weight_ma3",
-        "calories_ma3",
-        "age",
-        "gender",
-        "height_cm",
-        "body_fat_pct",
-        "current_weight",
-    ]
+@metrics.timed("model.energy_balance")
+def energy_balance_tdee(
+    user_id: str, window_days: int = ENERGY_BALANCE_WINDOW_DAYS
+) -> Optional[dict]:
+    """Closed-form TDEE: mean intake minus the energy of the weight trend.
+
+    Over the last ``window_days`` days, TDEE = mean calories - slope * 7700,
+    with the slope from a least-squares fit of weight on day. Bounds combine
+    the standard errors of the mean intake and the slope. Needs no model;
+    returns None without 2+ calorie days and 2+ weigh-ins on different days.
+    """
+    s = get_energy_balance_sums(user_id, window_days)
+    n_w, n_c = s["n_w"], s["n_c"]
+    if n_w < 2 or n_c < 2:
+        return None
+    sxx = s["sxx"] - s["sx"] ** 2 / n_w
+    if sxx <= 0:
+        return None
+    sxw = s["sxw"] - s["sx"] * s["sw"] / n_w
+    slope = sxw / sxx
+    mean_c = s["sc"] / n_c
+    tdee = mean_c - slope * KCAL_PER_KG
+    # Residual variance of the weight fit and sample variance of intake
+    var_w = 0.0
+    if n_w > 2:
+        var_w = max(0.0, (s["sww"] - s["sw"] ** 2 / n_w - slope * sxw) / (n_w - 2))
+    var_c = max(0.0, (s["scc"] - n_c * mean_c**2) / (n_c - 1))
+    se = math.sqrt(var_c / n_c + KCAL_PER_KG**2 * var_w / sxx)
+    return {
+        "tdee": round(tdee, 2),
+        "lower": round(tdee - ENERGY_BALANCE_Z * se, 2),
+        "upper": round(tdee + ENERGY_BALANCE_Z * se, 2),
+        "weight_slope_kg_per_day": round(slope, 4),
+        "window_days": window_days,
+    }
+
+
+def _latest_feature_matrix(items: list) -> "pd.DataFrame":
+    """One feature row per user from ``get_latest_features_many`` items."""
+    import pandas as pd
+
+    X = _fill_matrix(
+        np.array([it["row"][1:] for it in items], dtype=np.float32),
+        np.array(
+            [[it["stats"]["means"][col] for col in DERIVED_COLUMNS] for it in items],
+            dtype=np.float32,
+        ),
+        np.array([_profile_values(it["profile"]) for it in items], dtype=np.float32),
+    )
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False)
+
+
+@metrics.timed("model.predict_batch")
+def predict_tdee_many(user_ids: List[str]) -> Tuple[Dict[str, float], Dict[str, str]]:
+    """Latest TDEE for many users; returns ``(results, errors)`` keyed by user.
+
+    Inputs for every user come from one SQL query. Linear models are scored
+    together as a single matrix product and cold-start users in one call to
+    the population model; other tree models are scored per booster on the
+    prebuilt feature rows.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    latest = get_latest_features_many(user_ids)
+    results: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    ready, models = [], []
+    for user_id in user_ids:
+        item = latest.get(user_id)
+        if item is None:
+            errors[user_id] = "not_found"
+        elif item["stats"]["n_complete"] < 3:
+            errors[user_id] = "not_enough_data"
+        else:
+            model = load_model(user_id)
+            if model is None:
+                errors[user_id] = "model_not_trained"
+            else:
+                ready.append(item)
+                models.append(model)
+    if not ready:
+        return results, errors
+
+    from sklearn.linear_model import LinearRegression
+
+    X = _latest_feature_matrix(ready)
+    linear = [i for i, m in enumerate(models) if isinstance(m, LinearRegression)]
+    if linear:
+        coefs = np.stack([models[i].coef_ for i in linear])
+        intercepts = np.array([models[i].intercept_ for i in linear])
+        preds = np.einsum("ij,ij->i", X.iloc[linear].to_numpy(), coefs) + intercepts
+        for i, pred in zip(linear, preds):
+            results[ready[i]["profile"]["user_id"]] = round(float(pred), 2)
+    # Cold-start users share one population model: score them in one call
+    shared: Dict[int, List[int]] = {}
+    for i, model in enumerate(models):
+        if isinstance(model, ResidualModel):
+            shared.setdefault(id(model.population), []).append(i)
+    for rows in shared.values():
+        residuals = np.array([models[i].residual for i in rows])
+        preds = models[rows[0]].population.predict(X.iloc[rows]) + residuals
+        for i, pred in zip(rows, preds):
+            results[ready[i]["profile"]["user_id"]] = round(float(pred), 2)
+    for i, model in enumerate(models):
+        if isinstance(model, (LinearRegression, ResidualModel)):
+            continue
+        user_id = ready[i]["profile"]["user_id"]
+        try:
+            results[user_id] = round(float(model.predict(X.iloc[[i]])[0]), 2)
+        except Exception as exc:
+            errors[user_id] = f"prediction_failed: {exc}"
+    return results, errors
+
+
+def get_feature_importance(
+    user_id: str, ctx: Optional[UserContext] = None
+) -> Dict[str, float]:
+    model = (ctx or UserContext(user_id)).model
+    feature_names = FEATURE_COLUMNS
     if hasattr(model, "feature_importances_"):
         fi = dict(zip(feature_names, model.feature_importances_))
         return {k: round(float(v), 3) for k, v in fi.items()}
@@ -122,30 +706,27 @@ def get_feature_importance(user_id: str) -> Dict[str, float]:
         return {}
 
 
-def tdee_trend(user_id: str, window=5) -> Any:
-    model = load_model(user_id)
-    df = get_entries_df(user_id)
-    profile = get_user_profile(user_id)
-    if model is None or df is None or profile is None or df.empty:
+def tdee_trend(user_id: str, window=5, ctx: Optional[UserContext] = None) -> Any:
+    ctx = ctx or UserContext(user_id)
+    model = ctx.model
+    X = ctx.recent_X(window) if model is not None and window > 0 else None
+    if X is None:
         return []
-    df = build_features(df, profile)
-    X = df[
-        [
-            "weight",
-            "calories",
-            "weight_lag1",
-            "calories_lag1",
-            "weight_ma3",
-            "calories_ma3",
-            "age",
-            "gender",
-            "height_cm",
-            "body_fat_pct",
-            "current_weight",
-        ]
-    ].fillna(0)
-    preds = model.predict(X)
-    return list(map(lambda x: round(float(x), 2), preds[-window:]))
+    # Only the scored tail is read from the feature store
+    with metrics.stage("model.predict"):
+        preds = model.predict(X)
+    return list(map(lambda x: round(float(x), 2), preds))
+
+
+def preload():
+    """Import the ML stack ahead of the first request that needs it."""
+    start = time.perf_counter()
+    import pandas  # noqa: F401
+    import joblib  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import xgboost  # noqa: F401
+
+    logger.info("ML stack loaded in %.2fs", time.perf_counter() - start)
 
 
 def retrain_on_new_entry(user_id: str):
@@ -0,0 +1,286 @@
+"""Pluggable storage for serialized per-user models.
+
+``MODEL_STORE=file`` (default) keeps one ``models/{user_id}_model.bin`` per
+user. ``MODEL_STORE=sqlite`` packs every model into BLOB rows of a single
+SQLite file (``MODEL_STORE_PATH``), with per-user version history and
+compaction::
+
+    python -m app.model_store compact --keep 3
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.database import get_conn
+
+MODEL_STORE = os.environ.get("MODEL_STORE", "file")
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+MODEL_STORE_PATH = os.environ.get("MODEL_STORE_PATH", "models/models.db")
+
+
+class ModelStore:
+    """Interface for model backends; data is opaque serialized bytes.
+
+    ``version`` is a cheap token that changes whenever a user's current model
+    is replaced, so callers can validate cached models without reading them.
+    """
+
+    def save(self, user_id: str, data: bytes) -> int:
+        """Atomically store ``data`` as the current model; returns its version."""
+        raise NotImplementedError
+
+    def load(
+        self, user_id: str, version: Optional[int] = None
+    ) -> Optional[Tuple[bytes, int]]:
+        """Return ``(data, version)`` of the current (or given) model, or None."""
+        raise NotImplementedError
+
+    def version(self, user_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def delete(self, user_id: str) -> bool:
+        """Remove every stored version for ``user_id``; False if there were none."""
+        raise NotImplementedError
+
+    def history(self, user_id: str) -> List[dict]:
+        """Stored versions for ``user_id``, newest first."""
+        raise NotImplementedError
+
+    def compact(self, keep: int = 1) -> dict:
+        """Drop all but the newest ``keep`` versions per user and reclaim space."""
+        raise NotImplementedError
+
+
+class FileModelStore(ModelStore):
+    def __init__(self, directory: str = MODEL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{user_id}_model.bin")
+
+    def _legacy_path(self, user_id: str) -> str:
+        # joblib pickles written before the compact format
+        return os.path.join(self.directory, f"{user_id}_model.pkl")
+
+    def save(self, user_id: str, data: bytes) -> int:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".bin")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(user_id))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return os.stat(self.path(user_id)).st_mtime_ns
+
+    def _current_path(self, user_id: str) -> Optional[Tuple[str, int]]:
+        for path in (self.path(user_id), self._legacy_path(user_id)):
+            try:
+                return path, os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return None
+
+    def load(self, user_id, version=None):
+        current = self._current_path(user_id)
+        if current is None or (version is not None and version != current[1]):
+            return None
+        try:
+            with open(current[0], "rb") as f:
+                return f.read(), current[1]
+        except FileNotFoundError:
+            return None
+
+    def version(self, user_id):
+        current = self._current_path(user_id)
+        return current[1] if current else None
+
+    def delete(self, user_id):
+        removed = False
+        for path in (self.path(user_id), self._legacy_path(user_id)):
+            try:
+                os.unlink(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def history(self, user_id):
+        current = self._current_path(user_id)
+        if current is None:
+            return []
+        return [
+            {
+                "version": current[1],
+                "size": os.path.getsize(current[0]),
+                "created_at": current[1] / 1e9,
+            }
+        ]
+
+    def compact(self, keep=1):
+        # Files keep no history; only clean up temp files from crashed writes
+        removed = 0
+        for tmp in glob.glob(os.path.join(self.directory, ".tmp-*")):
+            if time.time() - os.path.getmtime(tmp) > 3600:
+                os.unlink(tmp)
+                removed += 1
+        return {"removed_versions": 0, "removed_temp_files": removed}
+
+
+class SQLiteModelStore(ModelStore):
+    def __init__(self, path: str = MODEL_STORE_PATH):
+        self.path = Path(path)
+        with get_conn(self.path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS model_blobs (
+                    user_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (user_id, version)
+                )
+            """
+            )
+
+    def _conn(self):
+        return get_conn(self.path)
+
+    def save(self, user_id, data):
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            (version,) = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM model_blobs WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO model_blobs (user_id, version, created_at, size, data)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (user_id, version, time.time(), len(data), data),
+            )
+        return version
+
+    def load(self, user_id, version=None):
+        if version is None:
+            row = (
+                self._conn()
+                .execute(
+                    """
+                    SELECT data, version FROM model_blobs WHERE user_id = ?
+                    ORDER BY version DESC LIMIT 1
+                    """,
+                    (user_id,),
+                )
+                .fetchone()
+            )
+        else:
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT data, version FROM model_blobs WHERE user_id = ? AND version = ?",
+                    (user_id, version),
+                )
+                .fetchone()
+            )
+        return (bytes(row[0]), row[1]) if row else None
+
+    def version(self, user_id):
+        (version,) = (
+            self._conn()
+            .execute(
+                "SELECT MAX(version) FROM model_blobs WHERE user_id = ?", (user_id,)
+            )
+            .fetchone()
+        )
+        return version
+
+    def delete(self, user_id):
+        with self._conn() as conn:
+            return (
+                conn.execute(
+                    "DELETE FROM model_blobs WHERE user_id = ?", (user_id,)
+                ).rowcount
+                > 0
+            )
+
+    def history(self, user_id):
+        rows = (
+            self._conn()
+            .execute(
+                """
+                SELECT version, size, created_at FROM model_blobs
+                WHERE user_id = ? ORDER BY version DESC
+                """,
+                (user_id,),
+            )
+            .fetchall()
+        )
+        return [{"version": v, "size": s, "created_at": c} for v, s, c in rows]
+
+    def compact(self, keep=1):
+        keep = max(1, keep)
+        with self._conn() as conn:
+            removed = conn.execute(
+                """
+                DELETE FROM model_blobs WHERE version <= (
+                    SELECT MAX(b.version) FROM model_blobs b
+                    WHERE b.user_id = model_blobs.user_id
+                ) - ?
+                """,
+                (keep,),
+            ).rowcount
+        self._conn().execute("VACUUM")
+        return {"removed_versions": removed, "removed_temp_files": 0}
+
+
+_store: Optional[ModelStore] = None
+
+
+def get_model_store() -> ModelStore:
+    """Return the process-wide store selected by ``MODEL_STORE``."""
+    global _store
+    if _store is None:
+        if MODEL_STORE == "sqlite":
+            _store = SQLiteModelStore()
+        elif MODEL_STORE == "file":
+            _store = FileModelStore()
+        else:
+            raise ValueError(f"Unknown MODEL_STORE {MODEL_STORE!r}")
+    return _store
+
+
+def set_model_store(store: Optional[ModelStore]):
+    """Swap the process-wide store (None re-reads ``MODEL_STORE`` lazily)."""
+    global _store
+    _store = store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model store maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="Drop old versions, reclaim space")
+    compact.add_argument("--keep", type=int, default=1)
+    history = sub.add_parser("history", help="List stored versions for a user")
+    history.add_argument("user_id")
+    args = parser.parse_args(argv)
+
+    store = get_model_store()
+    if args.command == "compact":
+        print(store.compact(keep=args.keep))
+    else:
+        for item in store.history(args.user_id):
+            print(item)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import sqlite3
+from typing import Optional
+
+
+def create_tables(conn: sqlite3.Connection):
+    # Offset of each cold-start user from the shared population model; such
+    # users keep no model of their own in the model store.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS population_residuals (
+            user_id TEXT PRIMARY KEY,
+            residual REAL NOT NULL,
+            n_rows INTEGER NOT NULL
+        )
+    """
+    )
+
+
+def store_residual(conn: sqlite3.Connection, user_id: str, residual: float, n: int):
+    conn.execute(
+        """
+        INSERT INTO population_residuals (user_id, residual, n_rows) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            residual = excluded.residual,
+            n_rows = excluded.n_rows
+        """,
+        (user_id, residual, n),
+    )
+
+
+def delete_residual(conn: sqlite3.Connection, user_id: str):
+    conn.execute("DELETE FROM population_residuals WHERE user_id = ?", (user_id,))
+
+
+def load_residual(conn: sqlite3.Connection, user_id: str) -> Optional[float]:
+    row = conn.execute(
+        "SELECT residual FROM population_residuals WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.coordination import worker_id
+from app.database import get_latest_model_change, get_model_changes
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_MAX_MODELS = int(os.environ.get("MODEL_CACHE_MAX_MODELS", "256"))
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", str(256 << 20)))
+MODEL_SYNC_INTERVAL_SECONDS = float(
+    os.environ.get("MODEL_SYNC_INTERVAL_SECONDS", "1.0")
+)
+
+
+class _CachedModel:
+    __slots__ = ("model", "nbytes", "token")
+
+    def __init__(self, model: Any, nbytes: int, token: Optional[int]):
+        self.model = model
+        self.nbytes = nbytes
+        self.token = token
+
+
+class ModelRegistry:
+    """Bounded in-process LRU of loaded per-user models.
+
+    Entries are keyed by user. A retrain installs the fresh model directly,
+    so the file is not read back. Each entry carries the model store's
+    version ``token`` (file mtime or stored version number) it was loaded
+    at; that is how stale copies, including models replaced by another
+    process, are detected.
+    Size is approximated by the serialized model size.
+    """
+
+    def __init__(
+        self,
+        max_models: int = MODEL_CACHE_MAX_MODELS,
+        max_bytes: int = MODEL_CACHE_MAX_BYTES,
+    ):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CachedModel]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str, token: Optional[int] = None) -> Optional[Any]:
+        """Return the cached model for ``user_id`` or None on a miss.
+
+        When ``token`` is given, an entry loaded from an older stored
+        version is treated as stale and dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and token is not None and entry.token != token:
+                self._drop(user_id)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.model
+
+    def put(
+        self,
+        user_id: str,
+        model: Any,
+        nbytes: int = 0,
+        token: Optional[int] = None,
+    ):
+        """Cache ``model`` for ``user_id``, replacing any older entry."""
+        with self._lock:
+            if user_id in self._entries:
+                self._drop(user_id)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[user_id] = _CachedModel(model, nbytes, token)
+            self._bytes += nbytes
+            while self._entries and (
+                len(self._entries) > self.max_models or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if user_id in self._entries:
+                self._drop(user_id)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "bytes": self._bytes,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, user_id: str):
+        entry = self._entries.pop(user_id)
+        self._bytes -= entry.nbytes
+
+
+class ModelChangeWatcher:
+    """Evicts models that other worker processes have retrained.
+
+    Polls the shared ``model_changes`` log every ``interval`` seconds. Reads
+    already validate cached models against the store version, so this keeps
+    workers from holding replaced models in memory rather than guarding
+    correctness.
+    """
+
+    def __init__(
+        self, registry: ModelRegistry, interval: float = MODEL_SYNC_INTERVAL_SECONDS
+    ):
+        self.registry = registry
+        self.interval = interval
+        self._seq: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._seq = get_latest_model_change()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="model-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self) -> int:
+        """Apply changes logged since the last poll; returns users evicted."""
+        if self._seq is None:
+            self._seq = get_latest_model_change()
+            return 0
+        self._seq, changes, gap = get_model_changes(self._seq)
+        if gap:
+            # Fell behind the log's retention; drop everything to be safe
+            evicted = self.registry.stats()["models"]
+            self.registry.clear()
+            return evicted
+        me = worker_id()
+        evicted = {user_id for user_id, owner in changes if owner != me}
+        for user_id in evicted:
+            self.registry.invalidate(user_id)
+        return len(evicted)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling model changes failed")
+
+
+model_registry = ModelRegistry()
+model_change_watcher = ModelChangeWatcher(model_registry)
@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from app import metrics
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "4096"))
+RESPONSE_CACHE_MAX_BYTES = int(
+    os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 << 20))
+)
+
+RESPONSE_CACHE = metrics.counter(
+    "metabolicai_response_cache_total",
+    "Cached GET responses by result.",
+    ("result",),
+)
+
+
+class ResponseCache:
+    """Bounded LRU of rendered response bodies.
+
+    Keys include the ETag, i.e. the user's data version (and model version
+    where it matters), so a write simply makes older entries unreachable;
+    they age out of the LRU instead of being invalidated. Bodies are kept
+    as encoded bytes and bounded by both count and total size, since a
+    full ``/history`` can be far larger than a prediction.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        RESPONSE_CACHE.inc("hit" if value is not None else "miss")
+        return value
+
+    def put(self, key: Hashable, value: bytes):
+        if self.max_entries <= 0 or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def make_etag(data_version: int, model_version: Optional[int] = None) -> str:
+    tag = f"d{data_version}"
+    if model_version is not None:
+        tag += f"-m{model_version}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+response_cache = ResponseCache()
+metrics.gauge(
+    "metabolicai_response_cache_entries",
+    "Responses held in the server-side response cache.",
+    response_cache.__len__,
+)
+metrics.gauge(
+    "metabolicai_response_cache_bytes",
+    "Bytes of rendered responses held in the server-side response cache.",
+    lambda: response_cache.nbytes,
+)
@@ -38,8 +38,24 @@ class TDEEPrediction(BaseModel):
     tdee: float
 
 
+class TDEEBatchRequest(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class TDEEBatchResponse(BaseModel):
+    results: Dict[str, float]
+    errors: Dict[str, str]
+
+
 class Analytics(BaseModel):
     weight_change: Optional[float] = None
     avg_calories: Optional[float] = None
     tdee_trend: Optional[List[float]] = None
     feature_importance: Optional[Dict[str, float]] = None
+
+
+class BulkIngestResult(BaseModel):
+    rows: int
+    chunks: int
+    elapsed_ms: float
+    rows_per_sec: float
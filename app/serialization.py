@@ -0,0 +1,87 @@
+"""Compact on-disk model format.
+
+A serialized model is ``MAGIC | uint32 header length | JSON header | payload``.
+The header records the model kind, feature list, training row count and a
+hash of the training data. The payload is the XGBoost booster in its native
+UBJSON format, or the float64 ``[intercept, *coef]`` array of a
+``LinearRegression``. Unlike a pickle, loading never imports arbitrary
+classes and survives library upgrades that change Python object layout.
+"""
+
+import hashlib
+import json
+import struct
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"MAI1"
+_HEADER_LEN = struct.Struct("<I")
+
+KIND_XGBOOST = "xgboost"
+KIND_LINEAR = "linear"
+
+
+def data_hash(X, y) -> str:
+    """Stable hash of a training matrix and target."""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(np.asarray(X, dtype=np.float64)).tobytes())
+    h.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def dumps(model: Any, meta: Optional[dict] = None) -> bytes:
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    header = dict(meta or {})
+    if isinstance(model, XGBRegressor):
+        header["kind"] = KIND_XGBOOST
+        payload = bytes(model.get_booster().save_raw(raw_format="ubj"))
+    elif isinstance(model, LinearRegression):
+        header["kind"] = KIND_LINEAR
+        payload = np.concatenate(
+            [[float(model.intercept_)], np.asarray(model.coef_, dtype=np.float64)]
+        ).tobytes()
+    else:
+        raise TypeError(f"Cannot serialize model of type {type(model).__name__}")
+    raw_header = json.dumps(header, separators=(",", ":")).encode()
+    return MAGIC + _HEADER_LEN.pack(len(raw_header)) + raw_header + payload
+
+
+def read_header(data: bytes) -> Tuple[dict, int]:
+    """Return ``(header, payload offset)`` without decoding the payload."""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a serialized MetabolicAI model")
+    (length,) = _HEADER_LEN.unpack_from(data, 4)
+    start = 4 + _HEADER_LEN.size
+    return json.loads(data[start : start + length]), start + length
+
+
+def loads(data: bytes) -> Tuple[Any, dict]:
+    """Rebuild a model from ``dumps`` output; returns ``(model, header)``."""
+    header, offset = read_header(data)
+    payload = data[offset:]
+    features = header.get("features")
+    if header["kind"] == KIND_XGBOOST:
+        from xgboost import Booster, XGBRegressor
+
+        # XGBRegressor.load_model re-parses the JSON config on top of the
+        # booster; attaching the booster directly is roughly twice as fast
+        booster = Booster()
+        booster.load_model(bytearray(payload))
+        model = XGBRegressor()
+        model._Booster = booster
+    elif header["kind"] == KIND_LINEAR:
+        from sklearn.linear_model import LinearRegression
+
+        params = np.frombuffer(payload, dtype=np.float64)
+        model = LinearRegression()
+        model.intercept_ = float(params[0])
+        model.coef_ = params[1:].copy()
+        model.n_features_in_ = len(model.coef_)
+        if features:
+            model.feature_names_in_ = np.asarray(features, dtype=object)
+    else:
+        raise ValueError(f"Unknown model kind {header['kind']!r}")
+    return model, header
@@ -0,0 +1,263 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, List, Optional
+
+from app import metrics
+from app.model import LEASE_BUSY, retrain_on_new_entry
+
+logger = logging.getLogger(__name__)
+
+RETRAIN_DEBOUNCE_SECONDS = float(os.environ.get("RETRAIN_DEBOUNCE_SECONDS", "2.0"))
+RETRAIN_MAX_DELAY_SECONDS = float(os.environ.get("RETRAIN_MAX_DELAY_SECONDS", "30.0"))
+RETRAIN_WORKERS = int(os.environ.get("RETRAIN_WORKERS", "2"))
+# How long a read may block on a pending retrain when no model exists yet
+TRAINING_WAIT_SECONDS = float(os.environ.get("TRAINING_WAIT_SECONDS", "10.0"))
+# How long app shutdown spends training queued users before dropping them
+TRAINING_SHUTDOWN_SECONDS = float(os.environ.get("TRAINING_SHUTDOWN_SECONDS", "30.0"))
+
+
+class _UserState:
+    __slots__ = ("first_dirty_at", "due_at", "training", "last_error")
+
+    def __init__(self):
+        self.first_dirty_at: Optional[float] = None
+        self.due_at: Optional[float] = None
+        self.training = False
+        self.last_error: Optional[str] = None
+
+    @property
+    def dirty(self) -> bool:
+        return self.due_at is not None
+
+    @property
+    def state(self) -> str:
+        if self.training:
+            return "training"
+        if self.dirty:
+            return "queued"
+        if self.last_error is not None:
+            return "failed"
+        return "idle"
+
+
+class TrainingScheduler:
+    """Coalesces entry writes into debounced, per-user background retrains.
+
+    Each write marks the user dirty and pushes its deadline back by
+    ``debounce`` seconds (capped at ``max_delay`` after the first write of a
+    burst). A dispatcher thread hands due users to a bounded worker pool; a
+    user is never trained by two workers at once, and writes that land while
+    a training is running simply re-queue the user. A user whose lease is
+    held by another process (``LEASE_BUSY``) is retried after ``debounce``.
+
+    Only pending and failed work is tracked: a user is forgotten once a
+    retrain finishes cleanly, so memory stays proportional to the backlog.
+    Whether a model exists is the model store's business, not the
+    scheduler's.
+    """
+
+    def __init__(
+        self,
+        train_fn: Callable[[str], str],
+        debounce: float = RETRAIN_DEBOUNCE_SECONDS,
+        max_delay: float = RETRAIN_MAX_DELAY_SECONDS,
+        max_workers: int = RETRAIN_WORKERS,
+    ):
+        self._train_fn = train_fn
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_workers = max(1, max_workers)
+        self._cond = threading.Condition()
+        self._users: Dict[str, _UserState] = {}
+        # Futures resolved once a user's pending retrain has finished
+        self._waiters: Dict[str, List[Future]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._running = 0
+        self._closed = False
+        # Retrain outcomes by status ("ok", "unchanged", ...) plus "error"
+        self._outcomes = Counter()
+
+    # --- lifecycle ---
+    def start(self):
+        with self._cond:
+            if self._dispatcher is not None and self._dispatcher.is_alive():
+                return
+            self._closed = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="retrain"
+            )
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="retrain-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+
+    def shutdown(self, flush: bool = True, timeout: Optional[float] = None):
+        """Stop the scheduler, optionally training every queued user first.
+
+        Users still queued after ``timeout`` are dropped; their stored
+        models then report as stale until the next write retrains them.
+        """
+        if flush and not self.flush(timeout=timeout):
+            logger.warning(
+                "Shutting down with %d retrains still queued", self.stats()["queued"]
+            )
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            dispatcher, executor = self._dispatcher, self._executor
+            self._dispatcher = self._executor = None
+            waiters, self._waiters = self._waiters, {}
+        for fut in (f for futs in waiters.values() for f in futs):
+            fut.cancel()
+        if dispatcher is not None:
+            dispatcher.join(timeout)
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    # --- producers ---
+    def mark_dirty(self, user_id: str):
+        """Record a data change for ``user_id`` and (re)schedule its retrain."""
+        self.start()
+        now = time.monotonic()
+        with self._cond:
+            st = self._users.setdefault(user_id, _UserState())
+            if st.first_dirty_at is None:
+                st.first_dirty_at = now
+            st.due_at = min(now + self.debounce, st.first_dirty_at + self.max_delay)
+            self._cond.notify_all()
+
+    def when_trained(self, user_id: str) -> Optional[Future]:
+        """Expedite any pending retrain for ``user_id`` without blocking.
+
+        Returns a future resolved once that work has finished, or None if
+        nothing is pending. Async callers can await it via
+        ``asyncio.wrap_future`` instead of parking a pool thread.
+        """
+        with self._cond:
+            st = self._users.get(user_id)
+            if st is None or not (st.dirty or st.training):
+                return None
+            if st.dirty:
+                st.due_at = time.monotonic()
+                self._cond.notify_all()
+            fut = Future()
+            self._waiters.setdefault(user_id, []).append(fut)
+            return fut
+
+    def wait(self, user_id: str, timeout: Optional[float] = None) -> bool:
+        """Expedite any pending retrain for ``user_id`` and block until done.
+
+        Returns True if there was pending work and it finished in time.
+        """
+        fut = self.when_trained(user_id)
+        if fut is None:
+            return False
+        try:
+            fut.result(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Make every queued user due now and wait for the queue to drain."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            now = time.monotonic()
+            for st in self._users.values():
+                if st.dirty:
+                    st.due_at = now
+            self._cond.notify_all()
+            while any(st.dirty or st.training for st in self._users.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # --- introspection ---
+    def status(self, user_id: str) -> dict:
+        """Scheduler-side state: ``queued``, ``training``, ``failed`` or ``idle``."""
+        with self._cond:
+            st = self._users.get(user_id) or _UserState()
+            return {"state": st.state, "last_error": st.last_error}
+
+    def stats(self) -> dict:
+        with self._cond:
+            states = [st.state for st in self._users.values()]
+            return {
+                "queued": states.count("queued"),
+                "training": states.count("training"),
+                "failed": states.count("failed"),
+                "workers": self.max_workers,
+                "outcomes": dict(self._outcomes),
+            }
+
+    # --- internals ---
+    def _next_due(self, now: float):
+        """Return (user_id, state) of the most overdue idle user, or None."""
+        best = None
+        for user_id, st in self._users.items():
+            if st.dirty and not st.training and st.due_at <= now:
+                if best is None or st.due_at < best[1].due_at:
+                    best = (user_id, st)
+        return best
+
+    def _earliest_due(self) -> Optional[float]:
+        dues = [
+            st.due_at for st in self._users.values() if st.dirty and not st.training
+        ]
+        return min(dues) if dues else None
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                picked = (
+                    self._next_due(now) if self._running < self.max_workers else None
+                )
+                if picked is None:
+                    due = self._earliest_due()
+                    if due is None or self._running >= self.max_workers:
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(max(0.0, due - now))
+                    continue
+                user_id, st = picked
+                st.training = True
+                st.due_at = st.first_dirty_at = None
+                self._running += 1
+                self._executor.submit(self._run, user_id)
+
+    def _run(self, user_id: str):
+        status, error = None, None
+        try:
+            status = self._train_fn(user_id)
+        except Exception as exc:  # keep the worker alive for other users
+            logger.exception("Retrain failed for user %s", user_id)
+            error = repr(exc)
+        metrics.RETRAINS.inc("error" if error else str(status))
+        with self._cond:
+            st = self._users[user_id]
+            st.training = False
+            st.last_error = error
+            self._outcomes["error" if error else status] += 1
+            if status == LEASE_BUSY:
+                if not st.dirty:
+                    st.first_dirty_at = time.monotonic()
+                    st.due_at = st.first_dirty_at + self.debounce
+            elif error is None and not st.dirty:
+                del self._users[user_id]
+            if not st.dirty:
+                for fut in self._waiters.pop(user_id, ()):
+                    if not fut.done():  # abandoned by a timed-out awaiter
+                        fut.set_result(error is None)
+            self._running -= 1
+            self._cond.notify_all()
+
+
+training_scheduler = TrainingScheduler(retrain_on_new_entry)
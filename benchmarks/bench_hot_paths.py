@@ -0,0 +1,260 @@
+"""Latency, throughput and memory of the request, training and prediction paths.
+
+Seeds synthetic users with each history length into a throwaway database,
+then times the in-process functions and the /entry, /tdee and /analytics
+endpoints (through TestClient at each concurrency level, with and without
+the response cache) and compares the results with a stored baseline.
+
+Usage::
+
+    python -m benchmarks.bench_hot_paths --days 30 365 1825 --concurrency 1 4
+    python -m benchmarks.bench_hot_paths --save-baseline   # refresh baseline
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app import database, model
+from app.context import UserContext
+from app.model_store import FileModelStore, get_model_store, set_model_store
+from app.registry import model_registry
+from app.response_cache import response_cache
+from app.schemas import Entry, UserProfile
+from app.training import training_scheduler
+from benchmarks.bench_training import synthetic_history
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+HEADERS = {"X-API-Key": "changeme"}
+START = datetime.date(2020, 1, 1)
+
+
+def seed_users(days: int, n_users: int) -> list:
+    user_ids = []
+    for i in range(n_users):
+        user_id = f"bench-{days}-{i}"
+        database.upsert_user(
+            UserProfile(
+                user_id=user_id,
+                age=30 + i,
+                gender="male",
+                height_cm=180,
+                body_fat_pct=18,
+            )
+        )
+        history = synthetic_history(days, seed=i)
+        database.upsert_entries(
+            user_id,
+            [
+                Entry(date=d, weight=w, calories=c)
+                for d, w, c in history.itertuples(index=False)
+            ],
+        )
+        model.train_and_save(user_id)
+        user_ids.append(user_id)
+    return user_ids
+
+
+def summarize(latencies: list, wall: float, peak_kb: float) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "n": len(ms),
+        "throughput": round(len(ms) / wall, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "peak_kb": round(peak_kb, 1),
+    }
+
+
+def peak_memory_kb(fn) -> float:
+    """Peak Python/NumPy allocation of a single ``fn()`` call, in KiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_calls(calls, concurrency: int) -> dict:
+    """Run zero-argument ``calls`` on ``concurrency`` threads and time each one."""
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(call):
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        for call in calls:
+            timed(call)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, calls))
+    wall = time.perf_counter() - start
+    return summarize(latencies, wall, peak_memory_kb(calls[0]))
+
+
+def function_calls(user_ids: list, n: int) -> dict:
+    users = itertools.cycle(user_ids)
+
+    def load_features():
+        # What requests pay: feature-store rows into a FeatureSet on a fresh
+        # context. Derivation from raw entries happens at write time.
+        UserContext(next(users)).features
+
+    def train_and_save():
+        # Without a stored model to compare against, the data fingerprint
+        # cannot short-circuit the retrain: this is a full fit and save
+        user_id = next(users)
+        get_model_store().delete(user_id)
+        model.train_and_save(user_id)
+
+    def predict():
+        model.predict_tdee(next(users))
+
+    return {
+        "load_features": [load_features] * n,
+        "train_and_save": [train_and_save] * max(1, n // 5),
+        "predict_tdee": [predict] * n,
+    }
+
+
+def endpoint_calls(client, user_ids: list, next_day: dict, n: int) -> dict:
+    """``next_day`` maps each user to the day offset of their next new entry."""
+    users = itertools.cycle(user_ids)
+    lock = threading.Lock()
+
+    def get(path, cached=True):
+        def call():
+            if not cached:
+                response_cache.clear()
+            r = client.get(path, headers={**HEADERS, "X-User-Id": next(users)})
+            assert r.status_code == 200, r.text
+
+        return call
+
+    def post_entry():
+        with lock:
+            user_id = next(users)
+            day = START + datetime.timedelta(days=next_day[user_id])
+            next_day[user_id] += 1
+        r = client.post(
+            "/entry",
+            json={"date": day.isoformat(), "weight": 80.0, "calories": 2200},
+            headers={**HEADERS, "X-User-Id": user_id},
+        )
+        assert r.status_code == 200, r.text
+
+    # Uncached variants clear the response cache before every request, so
+    # they time the full compute; cached ones mostly time ETag lookups
+    return {
+        "POST /entry": [post_entry] * n,
+        "GET /tdee": [get("/tdee", cached=False)] * n,
+        "GET /tdee cached": [get("/tdee")] * n,
+        "GET /analytics": [get("/analytics", cached=False)] * n,
+        "GET /analytics cached": [get("/analytics")] * n,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print each scenario against the baseline; return regressed keys."""
+    regressions = []
+    print(
+        f"\n{'scenario':<38} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'req/s':>9} {'peak KiB':>9} {'vs base p50':>12}"
+    )
+    for key, r in results.items():
+        base = baseline.get(key)
+        delta = ""
+        if base:
+            change = r["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+            delta = f"{change:+.0%}"
+            if change > tolerance:
+                delta += " !"
+                regressions.append(key)
+        print(
+            f"{key:<38} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['throughput']:>9.1f} {r['peak_kb']:>9.1f} {delta:>12}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365, 1825])
+    parser.add_argument("--users", type=int, default=4, help="Users per history length")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--requests", type=int, default=100, help="Calls per scenario")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed p50 slowdown"
+    )
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        set_model_store(FileModelStore(str(Path(tmp) / "models")))
+        model_registry.clear()
+        database.init_db()
+        client = TestClient(app)
+
+        results = {}
+        for days in args.days:
+            start = time.perf_counter()
+            user_ids = seed_users(days, args.users)
+            print(
+                f"seeded {args.users} users x {days} days "
+                f"in {time.perf_counter() - start:.1f}s",
+                file=sys.stderr,
+            )
+            for name, calls in function_calls(user_ids, args.requests).items():
+                results[f"{name} days={days}"] = run_calls(calls, 1)
+            next_day = dict.fromkeys(user_ids, days)
+            for concurrency in args.concurrency:
+                scenarios = endpoint_calls(client, user_ids, next_day, args.requests)
+                for name, calls in scenarios.items():
+                    key = f"{name} days={days} c={concurrency}"
+                    results[key] = run_calls(calls, concurrency)
+                    # Keep retrains started by POST /entry out of later scenarios
+                    training_scheduler.flush()
+        database.close_all()
+        set_model_store(None)
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"\nbaseline written to {args.baseline}")
+    elif regressions:
+        print(
+            f"\n{len(regressions)} scenario(s) slower than baseline by >{args.tolerance:.0%}"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Compare joblib pickles with the compact model format.
+
+Usage::
+
+    python -m benchmarks.bench_serialization --rows 365 --repeat 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+from app import serialization
+from app.model import FEATURE_COLUMNS
+
+
+def _load_compact(path: str):
+    with open(path, "rb") as f:
+        return serialization.loads(f.read())
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(args.rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    y = 2000 + 50 * X["weight"] + rng.normal(size=args.rows)
+    models = {
+        "linear": LinearRegression().fit(X, y),
+        "xgboost": XGBRegressor(n_estimators=25, max_depth=3, random_state=42).fit(
+            X, y
+        ),
+    }
+    print(f"{'model':<8} {'format':<8} {'bytes':>8} {'load us':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model in models.items():
+            pkl = os.path.join(tmp, f"{name}.pkl")
+            joblib.dump(model, pkl)
+            binary = os.path.join(tmp, f"{name}.bin")
+            with open(binary, "wb") as f:
+                f.write(serialization.dumps(model, {"features": FEATURE_COLUMNS}))
+            for fmt, path, loader in (
+                ("joblib", pkl, lambda p=pkl: joblib.load(p)),
+                ("compact", binary, lambda p=binary: _load_compact(p)),
+            ):
+                us = _time(loader, args.repeat)
+                print(f"{name:<8} {fmt:<8} {os.path.getsize(path):>8} {us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Cold-start cost of importing the app, with a per-package breakdown.
+
+Each measurement runs in a fresh interpreter. ``import app.main`` is what a
+worker pays before serving its first request; ``preload`` is the ML stack
+that is now loaded in the background (or on first use).
+
+Usage::
+
+    python -m benchmarks.bench_startup --runs 5 --top 10
+    python -m benchmarks.bench_startup --json > startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+_TIMED = """
+import time
+{setup}
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def _run_timed(code: str, setup: str = "") -> float:
+    """Seconds ``code`` takes in a fresh interpreter, after untimed ``setup``."""
+    out = subprocess.run(
+        [sys.executable, "-c", _TIMED.format(setup=setup, code=code)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def import_breakdown(module: str) -> dict:
+    """Self time per top-level package (seconds) from ``-X importtime``."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    totals = defaultdict(float)
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args(argv)
+
+    app_times = [_run_timed("import app.main") for _ in range(args.runs)]
+    preload_times = [
+        _run_timed("app.model.preload()", setup="import app.main")
+        for _ in range(max(1, args.runs // 2))
+    ]
+    breakdown = import_breakdown("app.main")
+    result = {
+        "import_app_main_s": round(min(app_times), 4),
+        "import_app_main_median_s": round(statistics.median(app_times), 4),
+        "preload_ml_s": round(statistics.median(preload_times), 4),
+        "packages_s": {k: round(v, 4) for k, v in list(breakdown.items())[: args.top]},
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"import app.main: best {result['import_app_main_s'] * 1000:.0f} ms, "
+        f"median {result['import_app_main_median_s'] * 1000:.0f} ms"
+    )
+    print(f"ML stack preload: ~{result['preload_ml_s'] * 1000:.0f} ms")
+    print(f"\n{'package':<24} {'self ms':>9}")
+    for name, seconds in result["packages_s"].items():
+        print(f"{name:<24} {seconds * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Read-path latency and size of the entries table before and after migration.
+
+Builds a database in the pre-migration layout (TEXT dates, INTEGER calories,
+rowid table), times representative reads, migrates it in place with
+``database.migrate`` and times the same reads on the new layout (integer day
+numbers, WITHOUT ROWID clustering, partial covering index for weigh-ins).
+
+Usage::
+
+    python -m benchmarks.bench_storage --users 2000 --days 1000   # 2M rows
+"""
+
+import argparse
+import datetime
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+
+START = datetime.date(2020, 1, 1)
+
+# name -> (legacy SQL, migrated SQL); parameters are (user_id, first, last)
+# with ISO dates for the legacy layout and day numbers for the new one
+QUERIES = {
+    "history page (100 rows)": (
+        """SELECT date, weight, calories FROM entries
+           WHERE user_id = ? AND date > ? AND date <= ? ORDER BY date LIMIT 100""",
+        """SELECT date(day * 86400, 'unixepoch'), weight, calories FROM entries
+           WHERE user_id = ? AND day > ? AND day <= ? ORDER BY day LIMIT 100""",
+    ),
+    "full history": (
+        """SELECT date, weight, calories FROM entries
+           WHERE user_id = ? AND date > ? AND date <= ? ORDER BY date""",
+        """SELECT date(day * 86400, 'unixepoch'), weight, calories FROM entries
+           WHERE user_id = ? AND day > ? AND day <= ? ORDER BY day""",
+    ),
+    "calorie aggregates": (
+        """SELECT COUNT(*), SUM(calories), COUNT(calories) FROM entries
+           WHERE user_id = ? AND date > ? AND date <= ?""",
+        """SELECT COUNT(*), SUM(calories), COUNT(calories) FROM entries
+           WHERE user_id = ? AND day > ? AND day <= ?""",
+    ),
+    "last weigh-in": (
+        """SELECT date, weight FROM entries
+           WHERE user_id = ? AND date > ? AND date <= ? AND weight IS NOT NULL
+           ORDER BY date DESC LIMIT 1""",
+        """SELECT day, weight FROM entries
+           WHERE user_id = ? AND day > ? AND day <= ? AND weight IS NOT NULL
+           ORDER BY day DESC LIMIT 1""",
+    ),
+}
+
+
+def build_legacy(conn: sqlite3.Connection, users: int, days: int, seed: int = 0):
+    rng = random.Random(seed)
+    dates = [(START + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+    conn.execute(
+        """
+        CREATE TABLE entries (
+            user_id TEXT NOT NULL, date TEXT NOT NULL, weight REAL,
+            calories INTEGER, PRIMARY KEY (user_id, date)
+        )
+        """
+    )
+
+    def rows():
+        # Users log day by day, interleaved, as a live service would write them
+        for date in dates:
+            for u in range(users):
+                weight = None if rng.random() < 0.3 else 80 + rng.random()
+                yield f"user-{u:06d}", date, weight, rng.randint(1500, 3000)
+
+    with conn:
+        conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", rows())
+
+
+def db_size_mb(conn: sqlite3.Connection) -> float:
+    conn.execute("VACUUM")
+    (pages,) = conn.execute("PRAGMA page_count").fetchone()
+    (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+    return pages * page_size / 2**20
+
+
+def time_queries(conn, migrated: bool, users: int, days: int, n: int) -> dict:
+    rng = random.Random(1)
+    results = {}
+    for name, sqls in QUERIES.items():
+        sql = sqls[migrated]
+        latencies = []
+        for _ in range(n):
+            user_id = f"user-{rng.randrange(users):06d}"
+            first = rng.randrange(days // 2)
+            last = first + days // 2
+            if migrated:
+                bounds = (database.to_day(START) + first, database.to_day(START) + last)
+            else:
+                bounds = tuple(
+                    (START + datetime.timedelta(days=d)).isoformat()
+                    for d in (first, last)
+                )
+            start = time.perf_counter()
+            conn.execute(sql, (user_id, *bounds)).fetchall()
+            latencies.append(time.perf_counter() - start)
+        results[name] = statistics.median(latencies) * 1e6
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200, help="Calls per query")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "storage.db"
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        build_legacy(conn, args.users, args.days)
+        print(
+            f"built {args.users * args.days:,} rows "
+            f"in {time.perf_counter() - start:.1f}s",
+            file=sys.stderr,
+        )
+        size_before = db_size_mb(conn)
+        before = time_queries(conn, False, args.users, args.days, args.queries)
+
+        start = time.perf_counter()
+        database.migrate(conn)
+        migrate_s = time.perf_counter() - start
+        size_after = db_size_mb(conn)
+        conn.execute("ANALYZE")
+        after = time_queries(conn, True, args.users, args.days, args.queries)
+        conn.close()
+
+    print(f"\n{'query':<26} {'legacy us':>10} {'migrated us':>12} {'speedup':>8}")
+    for name in QUERIES:
+        print(
+            f"{name:<26} {before[name]:>10.1f} {after[name]:>12.1f} "
+            f"{before[name] / after[name]:>7.1f}x"
+        )
+    print(f"\nsize: {size_before:.1f} MiB -> {size_after:.1f} MiB")
+    print(f"migration: {migrate_s:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""TDEE engines side by side: ML model vs closed-form energy balance.
+
+Seeds synthetic users (true TDEE 2300 kcal intake + 0.02 kg/day loss * 7700
+= 2454 kcal) into a throwaway database and reports each engine's latency
+and mean absolute error against that truth.
+
+Usage::
+
+    python -m benchmarks.bench_tdee_engines --days 30 365 1825 --requests 200
+"""
+
+import argparse
+import itertools
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from app import database, model
+from app.model_store import FileModelStore, set_model_store
+from app.registry import model_registry
+from benchmarks.bench_hot_paths import run_calls, seed_users
+
+TRUE_TDEE = 2300 + 0.02 * model.KCAL_PER_KG
+
+
+def engines() -> dict:
+    return {
+        "ml": lambda user_id: model.predict_tdee(user_id),
+        "energy_balance": lambda user_id: model.energy_balance_tdee(user_id)["tdee"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365, 1825])
+    parser.add_argument("--users", type=int, default=4, help="Users per history length")
+    parser.add_argument("--requests", type=int, default=200, help="Calls per engine")
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'engine':<16} {'days':>6} {'p50 us':>9} {'p99 us':>9} "
+        f"{'req/s':>10} {'MAE kcal':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        set_model_store(FileModelStore(str(Path(tmp) / "models")))
+        model_registry.clear()
+        database.init_db()
+        for days in args.days:
+            user_ids = seed_users(days, args.users)
+            for name, estimate in engines().items():
+                users = itertools.cycle(user_ids)
+                calls = [lambda: estimate(next(users))] * args.requests
+                r = run_calls(calls, 1)
+                mae = np.mean([abs(estimate(u) - TRUE_TDEE) for u in user_ids])
+                print(
+                    f"{name:<16} {days:>6} {r['p50_ms'] * 1000:>9.1f} "
+                    f"{r['p99_ms'] * 1000:>9.1f} {r['throughput']:>10.1f} {mae:>9.1f}"
+                )
+        database.close_all()
+        set_model_store(None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
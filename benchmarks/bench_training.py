@@ -0,0 +1,82 @@
+"""Training latency vs history length: full refit vs warm-start update.
+
+Usage::
+
+    python -m benchmarks.bench_training --days 30 180 365 1825 --new-days 7
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import model, serialization
+from app.features import DERIVED_COLUMNS
+
+PROFILE = {"user_id": "bench", "age": 35, "gender": "male", "height_cm": 180}
+
+
+def synthetic_history(days: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=days).strftime("%Y-%m-%d")
+    weight = 85 - np.cumsum(rng.normal(0.02, 0.2, size=days))
+    calories = rng.normal(2300, 250, size=days).round()
+    return pd.DataFrame({"date": dates, "weight": weight, "calories": calories})
+
+
+def synthetic_features(days: int) -> model.FeatureSet:
+    df = model.build_features(synthetic_history(days), PROFILE)
+    # Feature-store rows carry day numbers rather than ISO dates
+    df["day"] = (pd.to_datetime(df["date"]) - pd.Timestamp("1970-01-01")).dt.days
+    columns = ["day", "weight", "calories", *DERIVED_COLUMNS]
+    stats = {"means": dict.fromkeys(DERIVED_COLUMNS)}
+    return model.feature_set(df[columns].itertuples(index=False), stats, PROFILE)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 180, 365, 1825])
+    parser.add_argument("--new-days", type=int, default=model.XGB_INCREMENTAL_MIN_ROWS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'days':>6} {'full ms':>10} {'incremental ms':>15} {'speedup':>8}")
+    for days in args.days:
+        fs = synthetic_features(days)
+        X, y = fs.frame(), fs.y
+        n_old = days - args.new_days
+        prev, meta = model._fit_full(X.iloc[:n_old], y[:n_old])
+        header = {
+            "kind": (
+                serialization.KIND_XGBOOST
+                if model._wants_xgboost(n_old)
+                else serialization.KIND_LINEAR
+            ),
+            "n_rows": n_old,
+            "history_hash": model._history_hash(
+                fs.days[:n_old], fs.raw[:n_old], PROFILE
+            ),
+            **meta,
+        }
+        full = _best_of(lambda: model._fit_full(X, y), args.repeat)
+        incremental = _best_of(
+            lambda: model._fit_incremental(prev, header, fs, X, y, PROFILE),
+            args.repeat,
+        )
+        print(
+            f"{days:>6} {full:>10.2f} {incremental:>15.2f} {full / incremental:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import random
+
+from app import database
+from app.schemas import Entry
+
+
+def _naive(user_id):
+    entries = database.get_entries(user_id)
+    weights = [e["weight"] for e in entries if e["weight"] is not None]
+    calories = [e["calories"] for e in entries if e["calories"] is not None]
+    return {
+        "n_entries": len(entries),
+        "weight_change": round(weights[-1] - weights[0], 2) if weights else None,
+        "avg_calories": round(sum(calories) / max(1, len(calories)), 2),
+    }
+
+
+def _summary(user_id):
+    summary = database.get_analytics_summary(user_id)
+    return {k: summary[k] for k in ("n_entries", "weight_change", "avg_calories")}
+
+
+def test_analytics_summary_tracks_entry_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "analytics.db")
+    database.init_db()
+    rng = random.Random(3)
+    for _ in range(60):
+        day = rng.randint(1, 20)
+        database.upsert_entry(
+            "an",
+            Entry(
+                date=f"2025-04-{day:02d}",
+                weight=rng.choice([None, 60 + rng.random() * 5]),
+                calories=rng.choice([None, rng.randint(1500, 2500)]),
+            ),
+        )
+        assert _summary("an") == _naive("an")
+
+    database.upsert_entries(
+        "an", [Entry(date="2025-03-30", weight=58.0), Entry(date="2025-04-25")]
+    )
+    assert _summary("an") == _naive("an")
+
+    database.save_model_outputs("an", [2000.0, 2010.5], {"weight": 0.4})
+    summary = database.get_analytics_summary("an")
+    assert summary["tdee_trend"] == [2000.0, 2010.5]
+    assert summary["feature_importance"] == {"weight": 0.4}
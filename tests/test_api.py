@@ -1,9 +1,15 @@
+import json
+import uuid
+
+import pytest
+
 from app.database import init_db
 
 init_db()  # Ensures tables exist before tests run
 
 from fastapi.testclient import TestClient
 from app.main import app
+from app.training import training_scheduler
 
 client = TestClient(app)
 
@@ -190,3 +196,337 @@ def test_full_flow_with_all_branches():
     )
     # Should return 200 even if nothing is changed, but you may want to assert for fields as above.
     assert r.status_code == 200
+
+
+def test_bulk_entry_ingestion():
+    headers = {"X-API-Key": "changeme", "X-User-Id": "bulkuser"}
+    r = client.post(
+        "/user",
+        json={"user_id": "bulkuser", "age": 40, "gender": "female"},
+        headers={"X-API-Key": "changeme"},
+    )
+    assert r.status_code == 200
+
+    # --- JSON array
+    rows = [
+        {"date": f"2024-01-{d:02d}", "weight": 70 - d * 0.05, "calories": 2000 + d}
+        for d in range(1, 11)
+    ]
+    r = client.post("/entries/bulk", json=rows, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["rows"] == 10
+    assert "rows_per_sec" in r.json()
+
+    # --- NDJSON stream
+    ndjson = "\n".join(
+        '{"date": "2024-02-%02d", "weight": 69.0, "calories": 1900}' % d
+        for d in range(1, 6)
+    )
+    r = client.post(
+        "/entries/bulk",
+        content=ndjson,
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    assert r.json()["rows"] == 5
+
+    # --- CSV stream, blank cells keep the stored value
+    csv_body = "date,weight,calories\n2024-02-01,,2100\n2024-02-06,68.5,\n"
+    r = client.post(
+        "/entries/bulk",
+        content=csv_body,
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert r.status_code == 200
+    assert r.json()["rows"] == 2
+
+    r = client.get("/history", headers=headers)
+    history = {e["date"]: e for e in r.json()["entries"]}
+    assert len(history) == 16
+    assert history["2024-02-01"]["weight"] == 69.0
+    assert history["2024-02-01"]["calories"] == 2100
+
+    # --- Invalid rows reject the whole batch with their row index
+    bad = [{"date": "2024-03-01", "weight": 68}, {"date": "not-a-date"}]
+    r = client.post("/entries/bulk", json=bad, headers=headers)
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["row"] == 1
+    r = client.get("/history", headers=headers)
+    assert len(r.json()["entries"]) == 16
+
+    r = client.post(
+        "/entries/bulk",
+        content="<xml/>",
+        headers={**headers, "Content-Type": "application/xml"},
+    )
+    assert r.status_code == 415
+
+    # --- Undecodable bytes are a client error, reported by line
+    r = client.post(
+        "/entries/bulk",
+        content=b'{"date": "2024-03-02"}\n{"date": "\xff"}\n',
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Body is not valid UTF-8 on line 2"
+
+    # --- Quoted CSV fields may span lines
+    csv_body = 'date,note,calories\n2024-02-06,"ate out\n\nlate, ""big"" meal",2600\n'
+    r = client.post(
+        "/entries/bulk",
+        content=csv_body,
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert r.status_code == 200
+    assert r.json()["rows"] == 1
+    r = client.post(
+        "/entries/bulk",
+        content='date,note\n2024-03-04,"never closed\n',
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert r.status_code == 400
+
+
+def test_tdee_batch():
+    headers = {"X-API-Key": "changeme"}
+    for user_id, n_days, gender in [("batch_a", 10, "male"), ("batch_b", 6, "female")]:
+        r = client.post(
+            "/user",
+            json={"user_id": user_id, "age": 33, "gender": gender},
+            headers=headers,
+        )
+        assert r.status_code == 200
+        rows = [
+            {"date": f"2024-05-{d:02d}", "weight": 75 - d * 0.1, "calories": 2100 + d}
+            for d in range(1, n_days + 1)
+        ]
+        r = client.post(
+            "/entries/bulk", json=rows, headers={**headers, "X-User-Id": user_id}
+        )
+        assert r.status_code == 200
+    training_scheduler.flush(timeout=30)
+
+    r = client.post(
+        "/tdee/batch",
+        json={"user_ids": ["batch_a", "batch_b", "minimal", "ghost"]},
+        headers=headers,
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert set(body["results"]) == {"batch_a", "batch_b"}
+    assert body["errors"]["ghost"] == "not_found"
+    assert body["errors"]["minimal"] == "not_enough_data"
+
+    # Batch results match the single-user endpoint
+    for user_id in ("batch_a", "batch_b"):
+        r = client.get("/tdee", headers={**headers, "X-User-Id": user_id})
+        assert r.json()["tdee"] == pytest.approx(body["results"][user_id], abs=0.05)
+
+    r = client.post("/tdee/batch", json={"user_ids": []}, headers=headers)
+    assert r.status_code == 422
+
+
+def test_history_pages_filters_and_stream():
+    headers = {"X-API-Key": "changeme", "X-User-Id": "historyuser"}
+    rows = [
+        {"date": f"2024-03-{d:02d}", "weight": 80 - d * 0.1, "calories": 2000}
+        for d in range(1, 26)
+    ]
+    assert client.post("/entries/bulk", json=rows, headers=headers).status_code == 200
+
+    # --- Keyset pages cover the history exactly once
+    seen, after = [], None
+    while True:
+        params = {"limit": 10, **({"after": after} if after else {})}
+        body = client.get("/history", params=params, headers=headers).json()
+        seen += [e["date"] for e in body["entries"]]
+        after = body["next_after"]
+        if after is None:
+            break
+    assert seen == [r["date"] for r in rows]
+
+    # --- Inclusive date range
+    r = client.get(
+        "/history", params={"from": "2024-03-05", "to": "2024-03-07"}, headers=headers
+    )
+    assert [e["date"] for e in r.json()["entries"]] == [
+        "2024-03-05",
+        "2024-03-06",
+        "2024-03-07",
+    ]
+
+    # --- NDJSON stream
+    r = client.get(
+        "/history", params={"format": "ndjson", "from": "2024-03-20"}, headers=headers
+    )
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [e["date"] for e in lines] == [f"2024-03-{d}" for d in range(20, 26)]
+
+    r = client.get("/history", params={"limit": 0}, headers=headers)
+    assert r.status_code == 422
+
+
+def test_etag_and_response_cache(monkeypatch):
+    import app.main as main
+
+    user_id = f"etag-{uuid.uuid4().hex[:8]}"  # no model from an earlier run
+    headers = {"X-API-Key": "changeme", "X-User-Id": user_id}
+    client.post(
+        "/user",
+        json={"user_id": user_id, "age": 28, "gender": "female"},
+        headers=headers,
+    )
+    rows = [
+        {"date": f"2025-05-{d:02d}", "weight": 65 - d * 0.1, "calories": 1900 + d}
+        for d in range(1, 9)
+    ]
+    assert client.post("/entries/bulk", json=rows, headers=headers).status_code == 200
+    first = client.get("/tdee", headers=headers)
+    assert first.status_code == 200
+    training_scheduler.flush()
+    r = client.get("/tdee", headers=headers)
+    etag, body = r.headers["etag"], r.json()
+    # The first read waited for the first model, so its body matches neither
+    # the version it started at nor the one after: served once, uncached
+    assert "etag" not in first.headers and first.json() == body
+    assert first.headers["cache-control"] == "no-store"
+
+    # Conditional request: nothing recomputed or re-sent
+    r = client.get("/tdee", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+
+    # Repeat reads at the same version come from the response cache
+    def fail(ctx):
+        raise AssertionError("recomputed a cached response")
+
+    monkeypatch.setattr(main, "_compute_tdee", fail)
+    cached = client.get("/tdee", headers=headers)
+    assert cached.status_code == 200
+    assert cached.json() == body
+    monkeypatch.undo()
+
+    # A write bumps the data version and so the ETag
+    client.post(
+        "/entry",
+        json={"date": "2025-05-09", "weight": 64.0, "calories": 1950},
+        headers=headers,
+    )
+    r = client.get("/tdee", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    r = client.get("/history", headers=headers)
+    assert len(r.json()["entries"]) == 9
+
+    # The energy-balance engine needs no model and is cached separately
+    r = client.get("/tdee", params={"engine": "energy_balance"}, headers=headers)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["engine"] == "energy_balance"
+    assert data["lower"] <= data["tdee"] <= data["upper"]
+    assert r.headers["etag"] != client.get("/tdee", headers=headers).headers["etag"]
+    r = client.get("/tdee", params={"engine": "magic"}, headers=headers)
+    assert r.status_code == 422
+
+    # A write racing the compute must not file the older body under the
+    # newer ETag
+    from app import database
+    from app.schemas import Entry
+
+    compute = main._compute_energy_balance
+
+    def racing_write(uid):
+        estimate = compute(uid)
+        database.upsert_entry(uid, Entry(date="2025-05-11", weight=63.5))
+        return estimate
+
+    client.post(
+        "/entry", json={"date": "2025-05-10", "weight": 63.9}, headers=headers
+    )  # a new version, so the next read is computed
+    monkeypatch.setattr(main, "_compute_energy_balance", racing_write)
+    r = client.get("/tdee", params={"engine": "energy_balance"}, headers=headers)
+    assert r.status_code == 200 and "etag" not in r.headers
+    monkeypatch.undo()
+    fresh = client.get("/tdee", params={"engine": "energy_balance"}, headers=headers)
+    assert "etag" in fresh.headers
+    assert (
+        fresh.json()["weight_slope_kg_per_day"] != r.json()["weight_slope_kg_per_day"]
+    )
+
+
+def test_model_status_reflects_the_model_store():
+    # The API tests share the on-disk database and model store, so use a
+    # fresh user to be sure no model exists yet
+    user_id = f"status-{uuid.uuid4().hex[:8]}"
+    headers = {"X-API-Key": "changeme", "X-User-Id": user_id}
+    client.post(
+        "/user",
+        json={"user_id": user_id, "age": 33, "gender": "female"},
+        headers=headers,
+    )
+    rows = [
+        {"date": f"2025-06-{d:02d}", "weight": 60.0, "calories": 1800}
+        for d in range(1, 4)
+    ]
+    client.post("/entries/bulk", json=rows, headers=headers)
+    training_scheduler.flush()
+    status = client.get("/model/status", headers=headers).json()
+    assert status["state"] == "not_enough_data" and status["model_version"] is None
+
+    rows = [
+        {"date": f"2025-06-{d:02d}", "weight": 60.0, "calories": 1800}
+        for d in range(4, 11)
+    ]
+    client.post("/entries/bulk", json=rows, headers=headers)
+    training_scheduler.flush()
+    status = client.get("/model/status", headers=headers).json()
+    assert status["state"] == "fresh" and status["model_version"] is not None
+    # Same counter as the ETag of data-derived responses
+    etag = client.get("/history", headers=headers).headers["etag"]
+    assert etag == f'"d{status["data_version"]}"'
+
+    # A write whose retrain was lost (crash, bounded shutdown) shows as stale
+    from app import database
+    from app.schemas import Entry
+
+    database.upsert_entry(user_id, Entry(date="2025-06-11", weight=59.0, calories=1800))
+    status = client.get("/model/status", headers=headers).json()
+    assert status["state"] == "stale"
+    # ...while a write that leaves the training data as it was does not
+    database.upsert_entry(user_id, Entry(date="2025-06-11", weight=59.0, calories=1800))
+    training_scheduler.mark_dirty(user_id)
+    training_scheduler.flush()
+    assert client.get("/model/status", headers=headers).json()["state"] == "fresh"
+    database.upsert_entry(user_id, Entry(date="2025-06-11", weight=59.0, calories=1800))
+    assert client.get("/model/status", headers=headers).json()["state"] == "fresh"
+
+
+def test_model_status_without_a_profile_is_not_enough_data():
+    user_id = f"noprofile-{uuid.uuid4().hex[:8]}"
+    headers = {"X-API-Key": "changeme", "X-User-Id": user_id}
+    rows = [
+        {"date": f"2025-07-{d:02d}", "weight": 70.0, "calories": 2000}
+        for d in range(1, 11)
+    ]
+    assert client.post("/entries/bulk", json=rows, headers=headers).status_code == 200
+    training_scheduler.flush()
+    status = client.get("/model/status", headers=headers).json()
+    # Enough rows, but no profile to train with
+    assert status["state"] == "not_enough_data" and status["model_version"] is None
+
+
+def test_app_can_be_restarted_in_process(monkeypatch):
+    import app.main as main
+
+    monkeypatch.setattr(main, "ML_PRELOAD", False)
+    headers = {"X-API-Key": "changeme", "X-User-Id": "restartuser"}
+    for _ in range(2):
+        with TestClient(app) as c:
+            r = c.post(
+                "/user",
+                json={"user_id": "restartuser", "age": 40, "gender": "male"},
+                headers=headers,
+            )
+            assert r.status_code == 200
+            assert c.get("/history", headers=headers).status_code == 200
@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+
+from app import async_database, auth
+from app.database import init_db
+from app.main import app
+
+init_db()
+client = TestClient(app)
+ADMIN = {"X-API-Key": "changeme"}
+
+
+def test_per_user_api_keys(monkeypatch):
+    for user_id in ("keyuser", "otheruser"):
+        r = client.post(
+            "/user",
+            json={"user_id": user_id, "age": 33, "gender": "male"},
+            headers=ADMIN,
+        )
+        assert r.status_code == 200
+    r = client.post("/user/api-key", headers={**ADMIN, "X-User-Id": "keyuser"})
+    assert r.status_code == 200
+    api_key = r.json()["api_key"]
+    own = {"X-API-Key": api_key, "X-User-Id": "keyuser"}
+
+    # Resolved once, then served from the TTL cache
+    lookups = []
+    real_lookup = async_database.get_api_key_user
+
+    async def counting_lookup(key_hash):
+        lookups.append(key_hash)
+        return await real_lookup(key_hash)
+
+    monkeypatch.setattr(async_database, "get_api_key_user", counting_lookup)
+    assert client.get("/user", headers=own).json()["user_id"] == "keyuser"
+    assert client.get("/history", headers=own).status_code == 200
+    assert lookups == [auth.hash_api_key(api_key)]
+
+    # A user key only acts for its own user and cannot reach admin endpoints
+    r = client.get("/history", headers={**own, "X-User-Id": "otheruser"})
+    assert r.status_code == 403
+    r = client.post(
+        "/user", json={"user_id": "otheruser", "age": 1, "gender": "x"}, headers=own
+    )
+    assert r.status_code == 403
+    r = client.post("/tdee/batch", json={"user_ids": ["keyuser"]}, headers=own)
+    assert r.status_code == 403
+
+    r = client.delete("/user/api-key", headers=own)
+    assert r.json()["revoked"] == 1
+    assert client.get("/user", headers=own).status_code == 401
+
+
+def test_unknown_user_rejected_before_model_work():
+    headers = {**ADMIN, "X-User-Id": "never-registered"}
+    assert client.get("/tdee", headers=headers).status_code == 404
+    assert client.get("/analytics", headers=headers).status_code == 404
+
+
+def test_key_cache_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    cache = auth.KeyCache(ttl=10, max_keys=2)
+    cache.put("a", "u1")
+    cache.put("b", None)
+    assert cache.get("a") == (True, "u1")
+    assert cache.get("b") == (True, None)
+    now[0] += 11
+    assert cache.get("a") == (False, None)
+    cache.put("c", "u3")  # full: expired entries are swept first
+    assert cache.get("c") == (True, "u3")
@@ -0,0 +1,34 @@
+from app import batch_train, database
+from app.schemas import Entry, UserProfile
+
+
+def test_batch_train_trains_all_users_and_resumes(tmp_path, monkeypatch):
+    db_path = tmp_path / "batch.db"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_PATH", str(db_path))  # read by the spawned workers
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    database.init_db()
+    for n, user_id in enumerate(["u1", "u2", "u3"]):
+        database.upsert_user(UserProfile(user_id=user_id, age=30, gender="male"))
+        days = 3 if user_id == "u3" else 8
+        database.upsert_entries(
+            user_id,
+            [
+                Entry(date=f"2025-01-{d:02d}", weight=80 - d / 4, calories=2000 + d)
+                for d in range(1, days + 1)
+            ],
+        )
+
+    state = tmp_path / "state.jsonl"
+    summary = batch_train.run(
+        workers=2, chunk_size=2, state_path=str(state), progress=None
+    )
+    assert summary["users"] == 3
+    assert summary["by_status"] == {"ok": 2, "not_enough_data": 1}
+    assert (tmp_path / "models" / "u1_model.bin").exists()
+
+    summary = batch_train.run(
+        workers=1, state_path=str(state), resume=True, progress=None
+    )
+    assert summary["users"] == 0
+    assert summary["skipped_resumed"] == 3
@@ -0,0 +1,38 @@
+from app import context, database
+from app.context import UserContext
+from app.schemas import Entry, UserProfile
+
+
+def test_user_context_reads_each_item_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "ctx.db")
+    database.init_db()
+    database.upsert_user(UserProfile(user_id="ctxuser", age=30, gender="male"))
+    for i in range(5):
+        database.upsert_entry(
+            "ctxuser",
+            Entry(date=f"2025-07-1{i}", weight=80 - i / 2, calories=2200 + i),
+        )
+
+    calls = {"profile": 0, "rows": 0}
+    real_profile, real_rows = context.get_user_profile, context.get_feature_rows
+
+    def counting_profile(user_id):
+        calls["profile"] += 1
+        return real_profile(user_id)
+
+    def counting_rows(user_id, limit=None):
+        calls["rows"] += 1
+        return real_rows(user_id, limit)
+
+    monkeypatch.setattr(context, "get_user_profile", counting_profile)
+    monkeypatch.setattr(context, "get_feature_rows", counting_rows)
+
+    ctx = UserContext("ctxuser")
+    assert ctx.recent_X(2).shape == (2, 11)
+    assert ctx.recent_X(2) is ctx.recent_X(2)
+    assert ctx.X.shape == (5, 11)
+    assert ctx.features is ctx.features
+    # Once the full history is loaded, tails are sliced from it
+    assert ctx.recent_X(3).shape == (3, 11)
+    assert ctx.profile["age"] == 30
+    assert calls == {"profile": 1, "rows": 2}
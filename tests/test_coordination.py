@@ -0,0 +1,72 @@
+import pytest
+
+from app import coordination, database, model_store
+from app.model import LEASE_BUSY, train_and_save
+from app.registry import ModelChangeWatcher, ModelRegistry
+from app.schemas import Entry, UserProfile
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "coord.db")
+    model_store.set_model_store(model_store.FileModelStore(str(tmp_path / "models")))
+    database.init_db()
+    yield
+    model_store.set_model_store(None)
+
+
+def test_training_lease_is_exclusive_until_released_or_expired(db):
+    with database.get_conn() as conn:
+        assert coordination.acquire_lease(conn, "u1", "w1", ttl=60)
+        assert not coordination.acquire_lease(conn, "u1", "w2", ttl=60)
+        assert coordination.acquire_lease(conn, "u1", "w1", ttl=60)  # renewal
+        coordination.release_lease(conn, "u1", "w1")
+        assert coordination.acquire_lease(conn, "u1", "w2", ttl=-1)
+        # w2's lease is already expired, so w1 may take it over
+        assert coordination.acquire_lease(conn, "u1", "w1", ttl=60)
+
+
+def test_train_and_save_skips_users_leased_elsewhere(db):
+    database.upsert_user(UserProfile(user_id="c1", age=35, gender="female"))
+    database.upsert_entries(
+        "c1",
+        [
+            Entry(date=f"2025-04-{d:02d}", weight=70 - d * 0.1, calories=2100)
+            for d in range(1, 11)
+        ],
+    )
+    with database.get_conn() as conn:
+        coordination.acquire_lease(conn, "c1", "other-host:1", ttl=60)
+    assert train_and_save("c1") == (None, LEASE_BUSY)
+
+    with database.get_conn() as conn:
+        coordination.release_lease(conn, "c1", "other-host:1")
+    before = database.get_latest_model_change()
+    assert train_and_save("c1")[1] == "ok"
+    # The lease is released and the save is announced to other workers
+    seq, changes, _ = database.get_model_changes(before)
+    assert seq > before and changes == [("c1", coordination.worker_id())]
+    assert database.acquire_training_lease("c1", 60)
+
+
+def test_watcher_evicts_models_changed_by_other_workers(db):
+    registry = ModelRegistry()
+    watcher = ModelChangeWatcher(registry)
+    assert watcher.poll() == 0
+    registry.put("a", "model-a", nbytes=1)
+    registry.put("b", "model-b", nbytes=1)
+
+    database.record_model_change("a")  # this process: nothing to evict
+    with database.get_conn() as conn:
+        coordination.record_model_change(conn, "b", "other-host:1")
+    assert watcher.poll() == 1
+    assert registry.get("a") == "model-a"
+    assert registry.get("b") is None
+
+    # Falling behind the log's retention clears the whole cache
+    with database.get_conn() as conn:
+        coordination.record_model_change(conn, "b", "other-host:1")
+        coordination.record_model_change(conn, "b", "other-host:1")
+        conn.execute("DELETE FROM model_changes WHERE seq = ?", (watcher._seq + 1,))
+    assert watcher.poll() == 1
+    assert registry.get("a") is None
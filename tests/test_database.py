@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+from app import async_database, database
+from app.schemas import Entry
+
+
+def test_pooled_connection_is_reused_per_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "pool.db")
+    conn = database.get_conn()
+    assert database.get_conn() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(database.get_conn()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+
+    # Helpers run against the pooled connection and keep it open
+    database.init_db()
+    assert database.get_user("nobody") is None
+    assert database.get_conn() is conn
+    database.close_all()
+
+
+def test_async_mirror_runs_on_db_executor(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "async.db")
+    database.init_db()
+    threads = set()
+    real_get_entries = database.get_entries
+
+    def spy(*args):
+        threads.add(threading.current_thread().name)
+        return real_get_entries(*args)
+
+    monkeypatch.setattr(database, "get_entries", spy)
+
+    async def scenario():
+        await async_database.upsert_entry(
+            "u1", Entry(date="2025-01-01", weight=80, calories=2000)
+        )
+        entry = await async_database.get_entry("u1", "2025-01-01")
+        entries = await async_database.get_entries("u1")
+        return entry, entries
+
+    entry, entries = asyncio.run(scenario())
+    assert entry["weight"] == 80
+    assert entries == real_get_entries("u1")
+    assert all(name.startswith("db") for name in threads)
+
+
+def test_iter_entries_reads_in_keyset_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "iter.db")
+    database.init_db()
+    database.upsert_entries(
+        "u1",
+        [Entry(date=f"2025-01-{d:02d}", weight=80, calories=2000) for d in range(1, 8)],
+    )
+    dates = [e["date"] for e in database.iter_entries("u1", batch_size=2)]
+    assert dates == [f"2025-01-{d:02d}" for d in range(1, 8)]
+    dates = [
+        e["date"]
+        for e in database.iter_entries("u1", "2025-01-02", "2025-01-05", batch_size=3)
+    ]
+    assert dates == ["2025-01-02", "2025-01-03", "2025-01-04", "2025-01-05"]
+
+
+def test_migrates_text_dates_to_day_numbers(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "legacy.db")
+    conn = database.get_conn()
+    # Schema and data as written before migrations existed (user_version 0)
+    with conn:
+        conn.execute(
+            """
+            CREATE TABLE entries (
+                user_id TEXT NOT NULL, date TEXT NOT NULL, weight REAL,
+                calories INTEGER, PRIMARY KEY (user_id, date)
+            )
+        """
+        )
+        conn.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?, ?)",
+            [("u1", "1969-12-31", 81.0, 2100), ("u1", "2025-01-02", None, 1900)],
+        )
+        conn.execute(
+            """
+            CREATE TABLE analytics_summary (
+                user_id TEXT PRIMARY KEY, n_entries INTEGER, calories_sum REAL,
+                calories_count INTEGER, first_weight_date TEXT, first_weight REAL,
+                last_weight_date TEXT, last_weight REAL, tdee_trend TEXT,
+                feature_importance TEXT
+            )
+        """
+        )
+        conn.execute(
+            """
+            INSERT INTO analytics_summary VALUES
+                ('u1', 2, 4000, 2, '1969-12-31', 81.0, '1969-12-31', 81.0, '[2500.0]', NULL)
+        """
+        )
+    database.init_db()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    assert conn.execute(
+        "SELECT day, calories FROM entries ORDER BY day"
+    ).fetchall() == [
+        (-1, 2100.0),
+        (database.to_day("2025-01-02"), 1900.0),
+    ]
+    assert database.get_entries("u1", start="1969-12-31", end="1969-12-31") == [
+        {"date": "1969-12-31", "weight": 81.0, "calories": 2100.0}
+    ]
+    # Derived tables are rebuilt from the migrated rows; reruns are no-ops
+    assert database.get_feature_stats("u1")["n_rows"] == 2
+    summary = database.get_analytics_summary("u1")
+    assert summary["weight_change"] == 0.0 and summary["tdee_trend"] == [2500.0]
+    # A later weigh-in compares against the converted day numbers
+    database.upsert_entry("u1", Entry(date="2025-01-03", weight=79.0))
+    assert database.get_analytics_summary("u1")["weight_change"] == -2.0
+    assert database.migrate(conn) == 0
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'entries'")
+    assert "WITHOUT ROWID" in sql.fetchone()[0]
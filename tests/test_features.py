@@ -0,0 +1,54 @@
+import random
+
+import pandas as pd
+
+from app import database
+from app.model import build_features, feature_matrix, feature_set
+from app.schemas import Entry
+
+PROFILE = {"age": 35, "gender": "female", "height_cm": 165, "body_fat_pct": None}
+
+
+def _expected(user_id):
+    df = pd.DataFrame(database.get_entries(user_id))
+    return feature_matrix(build_features(df, PROFILE)).reset_index(drop=True)
+
+
+def _stored(user_id, limit=None):
+    rows = database.get_feature_rows(user_id, limit)
+    stats = database.get_feature_stats(user_id)
+    return feature_set(rows, stats, PROFILE).frame()
+
+
+def test_feature_store_matches_build_features(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "features.db")
+    database.init_db()
+    rng = random.Random(7)
+    days = list(range(1, 29))
+    rng.shuffle(days)  # arrive out of order, with gaps in weight/calories
+    for d in days:
+        database.upsert_entry(
+            "fs",
+            Entry(
+                date=f"2025-02-{d:02d}",
+                weight=None if d % 5 == 0 else 70 + rng.random(),
+                calories=None if d % 7 == 0 else 2000 + rng.randint(0, 400),
+            ),
+        )
+    pd.testing.assert_frame_equal(_stored("fs"), _expected("fs"), check_dtype=False)
+
+    # PATCH an older date and bulk-load a later range
+    database.upsert_entry("fs", Entry(date="2025-02-05", weight=65.0))
+    database.upsert_entries(
+        "fs",
+        [Entry(date=f"2025-03-{d:02d}", weight=71.0, calories=2100) for d in (3, 1)],
+    )
+    expected = _expected("fs")
+    pd.testing.assert_frame_equal(_stored("fs"), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        _stored("fs", limit=4),
+        expected.tail(4).reset_index(drop=True),
+        check_dtype=False,
+    )
+    stats = database.get_feature_stats("fs")
+    assert stats["n_rows"] == 30
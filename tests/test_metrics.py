@@ -0,0 +1,48 @@
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    hist = metrics.Histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "a")
+    hist.observe(0.5, "a")
+    hist.observe(5.0, "a")
+    lines = hist.samples()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="a"} 3' in lines
+
+    count = metrics.Counter("t_total", "Test.", ("status",))
+    count.inc('say "hi"')
+    assert count.samples() == ['t_total{status="say \\"hi\\""} 1']
+
+
+def test_timed_is_free_when_disabled(monkeypatch):
+    def fn():
+        return 1
+
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    assert metrics.timed("x")(fn) is fn
+    assert metrics.stage("x") is metrics.stage("y")
+
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    wrapped = metrics.timed("test.fn")(fn)
+    before = metrics.STAGE_SECONDS.count("test.fn")
+    assert wrapped() == 1
+    assert metrics.STAGE_SECONDS.count("test.fn") == before + 1
+
+
+def test_metrics_endpoint_exposes_stages_and_requests():
+    client = TestClient(app)
+    client.get("/history", headers={"X-API-Key": "changeme", "X-User-Id": "m"})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert "# TYPE metabolicai_stage_seconds histogram" in body
+    assert 'metabolicai_stage_seconds_count{stage="db.get_entries"}' in body
+    assert 'route="/history"' in body
+    assert "metabolicai_db_connections " in body
@@ -0,0 +1,170 @@
+import pytest
+
+from app import database, model_store
+from app import model
+from app.model import train_and_save
+from app.schemas import Entry, UserProfile
+
+
+@pytest.fixture
+def user(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "model.db")
+    model_store.set_model_store(model_store.FileModelStore(str(tmp_path / "models")))
+    database.init_db()
+    database.upsert_user(UserProfile(user_id="m1", age=41, gender="male"))
+    database.upsert_entries(
+        "m1",
+        [
+            Entry(date=f"2025-03-{d:02d}", weight=90 - d * 0.2, calories=2500 - d * 5)
+            for d in range(1, 11)
+        ],
+    )
+    yield "m1"
+    model_store.set_model_store(None)
+
+
+def test_retrain_is_skipped_when_data_is_unchanged(user):
+    assert train_and_save(user)[1] == "ok"
+    assert train_and_save(user)[1] == "unchanged"
+
+    # Re-sending stored values (or an empty PATCH) is still a no-op
+    database.upsert_entry(user, Entry(date="2025-03-05", weight=89.0))
+    assert train_and_save(user)[1] == "unchanged"
+
+    database.upsert_entry(user, Entry(date="2025-03-05", weight=88.0))
+    assert train_and_save(user)[1] == "ok"
+
+    profile = database.get_user(user)
+    database.upsert_user(profile.model_copy(update={"age": 42}))
+    assert train_and_save(user)[1] == "ok"
+
+
+def test_appended_days_warm_start_until_full_refit(user, monkeypatch):
+    monkeypatch.setattr(model, "TRAINING_MODE", "incremental")
+    monkeypatch.setattr(model, "XGB_INCREMENTAL_MIN_ROWS", 1)
+    monkeypatch.setattr(model, "FULL_REFIT_EVERY", 2)
+    assert train_and_save(user)[1] == "ok"
+    statuses = []
+    for d in range(11, 15):
+        database.upsert_entry(
+            user, Entry(date=f"2025-03-{d:02d}", weight=87.0, calories=2400)
+        )
+        statuses.append(train_and_save(user)[1])
+    assert statuses == ["incremental", "incremental", "ok", "incremental"]
+    header = model.load_model_header(user)
+    assert header["increments"] == 1 and header["n_rows"] == 14
+
+    # Editing an already-trained day forces a full refit
+    database.upsert_entry(user, Entry(date="2025-03-02", calories=2000))
+    assert train_and_save(user)[1] == "ok"
+
+
+def test_incremental_xgboost_stays_close_to_a_full_refit(user, monkeypatch):
+    import datetime
+
+    import numpy as np
+
+    from app.context import UserContext
+
+    monkeypatch.setattr(model, "TRAINING_MODE", "incremental")
+    rng = np.random.default_rng(0)
+    start = datetime.date(2024, 1, 1)
+
+    def log(first, n):
+        database.upsert_entries(
+            "noisy",
+            [
+                Entry(
+                    date=start + datetime.timedelta(days=first + i),
+                    weight=85 + rng.normal(0, 0.5),
+                    calories=rng.normal(2300, 250),
+                )
+                for i in range(n)
+            ],
+        )
+
+    database.upsert_user(UserProfile(user_id="noisy", age=35, gender="male"))
+    log(0, 60)
+    assert train_and_save("noisy")[1] == "ok"
+    # Too few new days for a warm start: refit instead
+    log(60, 1)
+    assert train_and_save("noisy")[1] == "ok"
+
+    log(61, model.XGB_INCREMENTAL_MIN_ROWS)
+    incremental, status = train_and_save("noisy")
+    assert status == "incremental"
+    ctx = UserContext("noisy")
+    y = ctx.features.y
+    full, _ = model._fit_full(ctx.X, y)
+    inc_pred, full_pred = incremental.predict(ctx.X), full.predict(ctx.X)
+    # The new trees must not just fit the new days and shift everything
+    assert np.abs(inc_pred - full_pred).mean() < 10
+    assert np.abs(inc_pred - y).mean() < np.abs(full_pred - y).mean() + 10
+
+
+def test_linear_sufficient_statistics_match_direct_fit():
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(30, 11)), columns=model.FEATURE_COLUMNS)
+    y = X.to_numpy() @ rng.normal(size=11) + 3.0
+    xtx_a, xty_a = model._linear_stats(X.iloc[:20], y[:20])
+    xtx_b, xty_b = model._linear_stats(X.iloc[20:], y[20:])
+    streamed = model._linear_from_stats(xtx_a + xtx_b, xty_a + xty_b)
+    direct = LinearRegression().fit(X, y)
+    np.testing.assert_allclose(streamed.predict(X), direct.predict(X), rtol=1e-6)
+
+
+def test_population_model_serves_cold_start_users(user):
+    for i, age in enumerate((25, 55)):
+        user_id = f"p{i}"
+        database.upsert_user(UserProfile(user_id=user_id, age=age, gender="female"))
+        database.upsert_entries(
+            user_id,
+            [
+                Entry(date=f"2025-03-{d:02d}", weight=65 + i, calories=1900 + 100 * i)
+                for d in range(1, 11)
+            ],
+        )
+    database.upsert_user(UserProfile(user_id="cold", age=30, gender="male"))
+    database.upsert_entries(
+        "cold",
+        [Entry(date=f"2025-03-0{d}", weight=80, calories=2600) for d in range(1, 5)],
+    )
+    assert train_and_save("cold") == (None, "not_enough_data")
+
+    summary = model.train_population([user, "p0", "p1", "cold"])
+    assert summary["status"] == "ok" and summary["cold_start_users"] == 1
+    cold = model.load_model("cold")
+    assert isinstance(cold, model.ResidualModel)
+    # Cold-start users keep an offset in SQLite, not a model file
+    assert model_store.get_model_store().version("cold") is None
+    tdee = model.predict_tdee("cold")
+    assert tdee is not None
+    results, errors = model.predict_tdee_many(["cold", user])
+    assert results["cold"] == tdee and errors == {user: "model_not_trained"}
+
+    assert train_and_save("cold")[1] == "population"
+    database.upsert_entries(
+        "cold",
+        [Entry(date=f"2025-03-{d:02d}", weight=80, calories=2600) for d in range(5, 9)],
+    )
+    assert train_and_save("cold")[1] == "ok"
+    assert database.get_population_residual("cold") is None
+    assert not isinstance(model.load_model("cold"), model.ResidualModel)
+
+
+def test_energy_balance_engine_is_closed_form(user):
+    # Weight falls 0.2 kg/day on 2472.5 kcal average: 2472.5 + 0.2 * 7700
+    estimate = model.energy_balance_tdee(user)
+    assert estimate["tdee"] == pytest.approx(4012.5)
+    assert estimate["weight_slope_kg_per_day"] == pytest.approx(-0.2)
+    assert estimate["lower"] < estimate["tdee"] < estimate["upper"]
+
+    # Only the trailing window counts (days 8-10 here)
+    assert model.energy_balance_tdee(user, window_days=3)["tdee"] == pytest.approx(
+        3995.0
+    )
+    assert model.energy_balance_tdee("nobody") is None
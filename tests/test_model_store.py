@@ -0,0 +1,41 @@
+import pytest
+
+from app.model_store import FileModelStore, SQLiteModelStore
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return FileModelStore(str(tmp_path / "models"))
+    return SQLiteModelStore(str(tmp_path / "models.db"))
+
+
+def test_save_load_and_versions(store):
+    assert store.load("alice") is None
+    assert store.version("alice") is None
+
+    v1 = store.save("alice", b"first")
+    assert store.load("alice") == (b"first", v1)
+    assert store.version("alice") == v1
+
+    v2 = store.save("alice", b"second")
+    assert v2 != v1
+    assert store.load("alice") == (b"second", v2)
+    assert store.history("alice")[0]["version"] == v2
+    assert store.load("bob") is None
+
+
+def test_sqlite_store_keeps_history_until_compaction(tmp_path):
+    store = SQLiteModelStore(str(tmp_path / "models.db"))
+    for i in range(4):
+        store.save("alice", b"v%d" % i)
+    store.save("bob", b"only")
+
+    assert [h["version"] for h in store.history("alice")] == [4, 3, 2, 1]
+    assert store.load("alice", version=2) == (b"v1", 2)
+
+    result = store.compact(keep=2)
+    assert result["removed_versions"] == 2
+    assert [h["version"] for h in store.history("alice")] == [4, 3]
+    assert store.load("bob") == (b"only", 1)
+    assert store.save("alice", b"v4") == 5
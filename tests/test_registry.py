@@ -0,0 +1,36 @@
+from app.registry import ModelRegistry
+
+
+def test_model_registry_lru_and_tokens():
+    registry = ModelRegistry(max_models=2, max_bytes=100)
+    registry.put("a", "model-a", nbytes=10)
+    registry.put("b", "model-b", nbytes=10)
+    assert registry.get("a") == "model-a"
+    registry.put("c", "model-c", nbytes=10)  # evicts b (LRU)
+    assert registry.get("b") is None
+    assert registry.get("c") == "model-c"
+
+    registry.invalidate("a")
+    assert registry.get("a") is None
+
+    registry.put("d", "model-d", nbytes=95)  # byte budget evicts the rest
+    stats = registry.stats()
+    assert stats["models"] == 1 and stats["bytes"] == 95
+    assert stats["hits"] == 2 and stats["evictions"] >= 2
+
+    # An entry loaded from an older stored version is dropped
+    registry.put("d", "model-d", nbytes=5, token=1)
+    assert registry.get("d", token=2) is None
+
+
+def test_model_registry_keeps_no_state_for_evicted_users():
+    registry = ModelRegistry(max_models=2, max_bytes=100)
+    registry.put("a", "model-a", nbytes=1)
+    registry.put("a", "model-a2", nbytes=1)  # replaces, not adds
+    assert registry.stats()["bytes"] == 1
+    for i in range(50):
+        registry.put(f"u{i}", "model", nbytes=1)
+    registry.invalidate("u49")
+    # Only live entries are tracked, so churn leaves nothing behind
+    assert registry.get("a") is None
+    assert registry.stats()["models"] == 1
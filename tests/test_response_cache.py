@@ -0,0 +1,21 @@
+from app.response_cache import ResponseCache
+
+
+def test_response_cache_is_bounded_by_total_bytes():
+    cache = ResponseCache(max_entries=100, max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    assert cache.get("a") == b"1234"  # "b" is now least recently used
+    cache.put("c", b"90ab")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"90ab"
+    assert cache.nbytes == 8
+
+    # A body larger than the whole budget is never cached
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None and len(cache) == 2
+
+    cache.put("a", b"12")  # replacing an entry releases its old size
+    assert cache.nbytes == 6
+    cache.clear()
+    assert cache.nbytes == 0 and len(cache) == 0
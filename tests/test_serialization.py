@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+from app import serialization
+from app.model import FEATURE_COLUMNS
+
+
+def _training_data(n=20):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    y = 2000 + 50 * X["weight"] + rng.normal(size=n)
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "model",
+    [LinearRegression(), XGBRegressor(n_estimators=5, max_depth=2, random_state=0)],
+)
+def test_roundtrip_preserves_predictions(model):
+    X, y = _training_data()
+    model.fit(X, y)
+    meta = {"features": FEATURE_COLUMNS, "n_rows": len(X)}
+    meta["data_hash"] = serialization.data_hash(X, y)
+
+    loaded, header = serialization.loads(serialization.dumps(model, meta))
+
+    assert header["kind"] in (serialization.KIND_LINEAR, serialization.KIND_XGBOOST)
+    assert header["n_rows"] == 20 and header["features"] == FEATURE_COLUMNS
+    assert header["data_hash"] == serialization.data_hash(X, y)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=1e-6)
+
+
+def test_rejects_foreign_files():
+    with pytest.raises(ValueError):
+        serialization.loads(b"\x80\x04not a model")
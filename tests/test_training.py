@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.training import TrainingScheduler
+
+
+def test_scheduler_coalesces_bursts_into_one_retrain():
+    calls = []
+    lock = threading.Lock()
+
+    def fake_train(user_id):
+        with lock:
+            calls.append(user_id)
+        return "ok"
+
+    scheduler = TrainingScheduler(fake_train, debounce=0.2, max_workers=2)
+    for _ in range(20):
+        scheduler.mark_dirty("alice")
+    scheduler.mark_dirty("bob")
+    assert scheduler.status("alice")["state"] == "queued"
+
+    assert scheduler.flush(timeout=5)
+    assert sorted(calls) == ["alice", "bob"]
+    # Finished users are forgotten; only pending or failed work is tracked
+    assert scheduler.status("alice") == {"state": "idle", "last_error": None}
+    assert scheduler.stats()["queued"] == scheduler.stats()["training"] == 0
+
+    # wait() on an idle user is a no-op
+    assert scheduler.wait("alice", timeout=1) is False
+    scheduler.shutdown()
+
+
+def test_scheduler_records_failures():
+    def broken_train(user_id):
+        raise RuntimeError("boom")
+
+    scheduler = TrainingScheduler(broken_train, debounce=0.0)
+    scheduler.mark_dirty("carol")
+    assert scheduler.wait("carol", timeout=5)
+    status = scheduler.status("carol")
+    assert status["state"] == "failed"
+    assert "boom" in status["last_error"]
+    scheduler.shutdown()
+
+
+def test_when_trained_lets_async_callers_wait_without_a_thread():
+    release = threading.Event()
+
+    def slow_train(user_id):
+        release.wait(5)
+        return "ok"
+
+    scheduler = TrainingScheduler(slow_train, debounce=60.0)
+    assert scheduler.when_trained("dave") is None
+    scheduler.mark_dirty("dave")
+
+    async def wait(timeout):
+        fut = scheduler.when_trained("dave")  # expedites the 60 s debounce
+        return await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+
+    # A timed-out awaiter cancels its future; the retrain is unaffected
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(wait(0.05))
+
+    async def release_then_wait():
+        task = asyncio.ensure_future(wait(5))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await task
+
+    assert asyncio.run(release_then_wait()) is True
+    assert scheduler.stats()["outcomes"] == {"ok": 1}
+    scheduler.shutdown()
+
+
+def test_shutdown_gives_up_on_leased_users_after_the_timeout():
+    from app.model import LEASE_BUSY
+
+    # Another process holds the lease: the user keeps being re-queued
+    scheduler = TrainingScheduler(lambda user_id: LEASE_BUSY, debounce=0.05)
+    scheduler.mark_dirty("erin")
+    start = time.monotonic()
+    scheduler.shutdown(timeout=0.3)
+    assert time.monotonic() - start < 2
+    assert scheduler.status("erin")["state"] == "queued"